@@ -5,7 +5,17 @@ Main
 Command line interface.
 """
 import argparse
-from abrvalg import __version__ as version, interpreter
+import os
+import sys
+from contextlib import ExitStack
+from abrvalg import __version__ as version, interpreter, server, stats
+from abrvalg.context import Budget, Output, DEFAULT_BUFFER_SIZE
+from abrvalg.errors import AbrvalgSyntaxError, BudgetExceededError, MemoryLimitError
+from abrvalg.lexer import Lexer
+from abrvalg.modules import ModuleCache, default_search_path
+from abrvalg.profiler import DEFAULT_MAX_OVERHEAD, DEFAULT_SAMPLE_INTERVAL, MemoryProfiler, Profiler, Sampler
+from abrvalg.snapshot import Snapshot
+from abrvalg.utils import dump_ast, dump_tokens
 
 
 try:
@@ -14,27 +24,118 @@ except NameError:
     pass
 
 
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError('{} is not a positive number'.format(value))
+    return number
+
+
 def parse_args():
     argparser = argparse.ArgumentParser()
     argparser.add_argument('-v', '--verbose', action='store_true')
+    argparser.add_argument('-p', '--persistent', action='store_true',
+                           help='make array and dictionary literals persistent (immutable) collections')
+    argparser.add_argument('--allow-path', action='append', metavar='PATH', dest='allowed_paths',
+                           help='give the script the file built-ins, restricted to this file or directory')
+    argparser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE,
+                           help='size of the output buffer in characters')
+    argparser.add_argument('--connect', metavar='SOCKET',
+                           help='run the file on a server started with `abrvalg serve --socket SOCKET`')
+    argparser.add_argument('--snapshot', metavar='FILE', help='start with the global values of a snapshot')
+    argparser.add_argument('--save-snapshot', metavar='FILE', help='save the global values after running the file')
+    argparser.add_argument('--max-steps', type=int, help='stop the script after this many loop iterations and calls')
+    argparser.add_argument('--timeout', type=float, metavar='SECONDS', help='stop the script after this much time')
+    argparser.add_argument('--dump-tokens', metavar='FILE', help='save the tokens as JSON lines instead of running')
+    argparser.add_argument('--dump-ast', metavar='FILE',
+                           help='save the AST as JSON lines, one statement per line, instead of running')
+    argparser.add_argument('--profile', action='store_true',
+                           help='print call counts and times of functions and lines to standard error')
+    argparser.add_argument('--profile-json', metavar='FILE', help='save the profile as JSON')
+    argparser.add_argument('--memory-profile', action='store_true',
+                           help='print memory allocated by functions and lines and large containers to standard error')
+    argparser.add_argument('--memory-profile-json', metavar='FILE', help='save the memory profile as JSON')
+    argparser.add_argument('--memory-limit', type=positive_int, metavar='BYTES',
+                           help='stop the script with an error when it uses more memory, approximately: it\'s '
+                                'checked between statements and every few loop iterations and calls, so one built-in '
+                                'call can go past it')
+    argparser.add_argument('--stats', action='store_true',
+                           help='print time and memory of each phase and evaluation counters to standard error')
+    argparser.add_argument('--stats-json', metavar='FILE', help='save the statistics as JSON')
+    argparser.add_argument('--sample', metavar='FILE',
+                           help='sample call stacks and save them in the collapsed format of flame graph tools')
+    argparser.add_argument('--sample-interval', type=float, default=DEFAULT_SAMPLE_INTERVAL, metavar='SECONDS',
+                           help='time between samples')
+    argparser.add_argument('--sample-max-overhead', type=float, default=DEFAULT_MAX_OVERHEAD, metavar='FRACTION',
+                           help='maximum fraction of the time spent sampling')
     argparser.add_argument('file', nargs='?')
-    return argparser.parse_args()
+    args = argparser.parse_args()
+    # Only one profiler can be enabled at a time.
+    memory = args.memory_profile or args.memory_profile_json or args.memory_limit is not None
+    if (args.profile or args.profile_json) and memory:
+        argparser.error('--profile and --profile-json can\'t be combined with the memory profile or --memory-limit')
+    return args
+
+
+def create_env(snapshot=None, allowed_paths=None):
+    env = interpreter.create_global_env(allowed_paths)
+    if snapshot:
+        Snapshot.load(snapshot).restore_into(env)
+    return env
 
 
-def interpret_file(path, verbose=False):
+def interpret_file(path, verbose=False, persistent=False, output=None, snapshot=None, save_snapshot=None,
+                   collect_stats=False, budget=None, allowed_paths=None):
+    """Runs the file at `path` and prints the result, returns the statistics if `collect_stats` is on."""
+    env = create_env(snapshot, allowed_paths)
+    # Modules are looked up next to the script first.
+    modules = ModuleCache([os.path.dirname(os.path.abspath(path))] + default_search_path(), persistent)
     with open(path) as f:
-        print(interpreter.evaluate(f.read(), verbose=verbose))
+        source = f.read()
+    collected = None
+    if collect_stats:
+        result, collected = stats.evaluate_env(source, env, persistent=persistent, output=output, modules=modules,
+                                                budget=budget)
+    else:
+        result = interpreter.evaluate_env(source, env, verbose=verbose, persistent=persistent, output=output,
+                                          modules=modules, budget=budget)
+    print(result)
+    if save_snapshot:
+        Snapshot.take(env).save(save_snapshot)
+    return collected
 
 
-def repl():
+def dump_file(path, tokens_path=None, ast_path=None, persistent=False):
+    with open(path) as f:
+        source = f.read()
+    try:
+        if tokens_path:
+            with open(tokens_path, 'w') as f:
+                dump_tokens(Lexer().tokenize(source), f)
+        if ast_path:
+            with open(ast_path, 'w') as f:
+                dump_ast(interpreter.parse(source, persistent).body, f, lines=True)
+    except AbrvalgSyntaxError as err:
+        sys.exit('Syntax error: {} at line {}, column {}'.format(err.message, err.line, err.column))
+
+
+def interpret_file_remotely(socket_path, path):
+    response = server.send_request(socket_path, {'path': os.path.abspath(path)})
+    sys.stdout.write(response['stdout'])
+    if 'error' in response:
+        sys.exit(response['error'])
+    print(response['result'])
+
+
+def repl(persistent=False, output=None, snapshot=None, allowed_paths=None):
     print('Abrvalg {}. Press Ctrl+C to exit.'.format(version))
-    env = interpreter.create_global_env()
+    env = create_env(snapshot, allowed_paths)
     buf = ''
     try:
         while True:
             inp = input('>>> ' if not buf else '')
             if inp == '':
-                print(interpreter.evaluate_env(buf, env))
+                print(interpreter.evaluate_env(buf, env, persistent=persistent, output=output))
                 buf = ''
             else:
                 buf += '\n' + inp
@@ -42,12 +143,63 @@ def repl():
         pass
 
 
+def report_memory(memory_profiler, show, path):
+    if show:
+        print(memory_profiler.report(), file=sys.stderr)
+    if path:
+        memory_profiler.dump(path)
+
+
 def main():
+    if sys.argv[1:2] == ['serve']:
+        server.main(sys.argv[2:])
+        return
     args = parse_args()
-    if args.file:
-        interpret_file(args.file, args.verbose)
+    output = Output(buffer_size=args.buffer_size)
+    if args.connect:
+        if not args.file:
+            sys.exit('--connect requires a file')
+        interpret_file_remotely(args.connect, args.file)
+    elif args.file and (args.dump_tokens or args.dump_ast):
+        dump_file(args.file, args.dump_tokens, args.dump_ast, args.persistent)
+    elif args.file:
+        profiler = Profiler() if args.profile or args.profile_json else None
+        memory_profiler = None
+        if args.memory_profile or args.memory_profile_json or args.memory_limit is not None:
+            memory_profiler = MemoryProfiler(args.memory_limit)
+        sampler = Sampler(args.sample_interval, args.sample_max_overhead) if args.sample else None
+        budget = None
+        if args.max_steps is not None or args.timeout is not None:
+            budget = Budget(args.max_steps, args.timeout)
+        try:
+            with ExitStack() as stack:
+                for collector in (profiler, memory_profiler, sampler):
+                    if collector is not None:
+                        stack.enter_context(collector)
+                collected = interpret_file(args.file, args.verbose, args.persistent, output, args.snapshot,
+                                           args.save_snapshot, args.stats or args.stats_json, budget,
+                                           args.allowed_paths)
+        except BudgetExceededError as err:
+            sys.exit('BudgetExceededError: {}'.format(err))
+        except MemoryLimitError as err:
+            # The memory profile tells where the memory went.
+            if memory_profiler is not None and (args.memory_profile or args.memory_profile_json):
+                report_memory(memory_profiler, args.memory_profile, args.memory_profile_json)
+            sys.exit('MemoryLimitError: {}'.format(err))
+        if memory_profiler is not None:
+            report_memory(memory_profiler, args.memory_profile, args.memory_profile_json)
+        if args.stats:
+            print(collected.report(), file=sys.stderr)
+        if args.stats_json:
+            collected.dump(args.stats_json)
+        if args.sample:
+            sampler.dump(args.sample)
+        if args.profile:
+            print(profiler.report(), file=sys.stderr)
+        if args.profile_json:
+            profiler.dump(args.profile_json)
     else:
-        repl()
+        repl(args.persistent, output, args.snapshot, args.allowed_paths)
 
 if __name__ == '__main__':
     main()
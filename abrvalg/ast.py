@@ -7,24 +7,121 @@ Abstract syntax tree nodes.
 
 from collections import namedtuple
 
-Number = namedtuple('Number', ['value'])
-String = namedtuple('String', ['value'])
-Identifier = namedtuple('Identifier', ['value'])
-Assignment = namedtuple('Assignment', ['left', 'right'])
-BinaryOperator = namedtuple('BinaryOperator', ['operator', 'left', 'right'])
-UnaryOperator = namedtuple('UnaryOperator', ['operator', 'right'])
-Call = namedtuple('Call', ['left', 'arguments'])
-Function = namedtuple('Function', ['name', 'params', 'body'])
-Condition = namedtuple('Condition', ['test', 'if_body', 'elifs', 'else_body'])
-ConditionElif = namedtuple('ConditionElif', ['test', 'body'])
-Match = namedtuple('Match', ['test', 'patterns', 'else_body'])
-MatchPattern = namedtuple('MatchPattern', ['pattern', 'body'])
-WhileLoop = namedtuple('WhileLoop', ['test', 'body'])
-ForLoop = namedtuple('ForLoop', ['var_name', 'collection', 'body'])
-Break = namedtuple('Break', [])
-Continue = namedtuple('Continue', [])
-Return = namedtuple('Return', ['value'])
-Array = namedtuple('Array', ['items'])
-Dictionary = namedtuple('Dictionary', ['items'])
-SubscriptOperator = namedtuple('SubscriptOperator', ['left', 'key'])
-Program = namedtuple('Program', ['body'])
+
+class _Node(object):
+    """
+    Base of the node types. `line` is stored as a trailing item, so nodes need no instance dictionary and stay
+    immutable, but it isn't one of `_fields` and doesn't take part in comparisons. The parser sets it on statements.
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if isinstance(other, _Node):
+            return self[:-1] == other[:-1]
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, _Node):
+            return self[:-1] != other[:-1]
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self[:-1])
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(field, value) for field, value in zip(self._fields, self)))
+
+
+def _node(name, fields):
+    base = namedtuple(name, fields + ['line'], defaults=(None,))
+    return type(name, (_Node, base), {'__slots__': (), '_fields': tuple(fields)})
+
+
+Number = _node('Number', ['value'])
+String = _node('String', ['value'])
+Identifier = _node('Identifier', ['value'])
+Assignment = _node('Assignment', ['left', 'right'])
+AugmentedAssignment = _node('AugmentedAssignment', ['operator', 'left', 'right'])
+BinaryOperator = _node('BinaryOperator', ['operator', 'left', 'right'])
+UnaryOperator = _node('UnaryOperator', ['operator', 'right'])
+Call = _node('Call', ['left', 'arguments'])
+Function = _node('Function', ['name', 'params', 'body'])
+Condition = _node('Condition', ['test', 'if_body', 'elifs', 'else_body'])
+ConditionElif = _node('ConditionElif', ['test', 'body'])
+Match = _node('Match', ['test', 'patterns', 'else_body'])
+MatchPattern = _node('MatchPattern', ['pattern', 'body'])
+WhileLoop = _node('WhileLoop', ['test', 'body'])
+ForLoop = _node('ForLoop', ['var_name', 'collection', 'body'])
+Break = _node('Break', [])
+Continue = _node('Continue', [])
+Return = _node('Return', ['value'])
+Yield = _node('Yield', ['value'])
+Await = _node('Await', ['value'])
+Import = _node('Import', ['path'])
+Array = _node('Array', ['items'])
+Dictionary = _node('Dictionary', ['items'])
+Set = _node('Set', ['items'])
+Vector = _node('Vector', ['items'])
+HashMap = _node('HashMap', ['items'])
+SubscriptOperator = _node('SubscriptOperator', ['left', 'key'])
+Program = _node('Program', ['body'])
+
+
+class GeneratorFunction(Function):
+    """Function with `yield` statements, calling it returns a lazy iterator over the yielded values."""
+    __slots__ = ()
+
+
+class LeafFunction(Function):
+    """Function that declares no functions and doesn't yield, its environments can't outlive calls and are reused."""
+    __slots__ = ()
+
+
+class GuardedAppend(AugmentedAssignment):
+    """
+    `x += [...]` the optimizer made of `x = x + [...]` assuming calls like `len(x)` reach the built-ins, it's evaluated
+    as written when one of them is bound to something else at run time.
+    """
+    __slots__ = ()
+
+
+class AsyncFunction(Function):
+    """Function declared with `async`, calling it returns a coroutine that runs the body on an event loop."""
+    __slots__ = ()
+
+
+def _iter_nodes(value):
+    if hasattr(value, '_fields'):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for node in _iter_nodes(item):
+                yield node
+
+
+def iter_child_nodes(node):
+    """Yields direct child nodes of `node`."""
+    for field in node._fields:
+        for child in _iter_nodes(getattr(node, field)):
+            yield child
+
+
+def walk(node, nested_functions=True):
+    """
+    Yields `node` (or every node of a list of nodes) and all descendants, in no particular order. With
+    `nested_functions` off, function declarations are yielded but not descended into.
+    """
+    stack = list(_iter_nodes(node))
+    while stack:
+        node = stack.pop()
+        yield node
+        if nested_functions or not isinstance(node, Function):
+            stack.extend(iter_child_nodes(node))
+
+
+def copy_location(node, old_node):
+    """Returns `node` that replaces `old_node` with the line of `old_node` if it has none."""
+    if old_node.line is not None and node.line is None:
+        return node._replace(line=old_node.line)
+    return node
@@ -0,0 +1,153 @@
+"""
+Context
+-------
+
+State of a running evaluation that isn't part of the program environment.
+"""
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from abrvalg.errors import BudgetExceededError
+from abrvalg.modules import default_cache
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_FRAME_POOL_SIZE = 64
+DEFAULT_BUDGET_CHECK_INTERVAL = 1000
+
+
+class Output(object):
+    """Collects text written by a script and passes it to `stream` in chunks of at least `buffer_size` characters."""
+
+    def __init__(self, stream=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._parts = []
+        self._size = 0
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        # Standard output is looked up late, so redirecting sys.stdout works as expected.
+        stream = self.stream or sys.stdout
+        if self._parts:
+            stream.write(''.join(self._parts))
+            self._parts = []
+            self._size = 0
+        stream.flush()
+
+
+class Budget(object):
+    """
+    Limits of an evaluation: the number of `steps`, loop iterations and calls, and the wall time in `seconds`. The
+    time is checked every `check_interval` steps.
+    """
+
+    def __init__(self, steps=None, seconds=None, check_interval=DEFAULT_BUDGET_CHECK_INTERVAL):
+        self.steps = steps
+        self.seconds = seconds
+        self.check_interval = check_interval
+
+
+class Context(object):
+
+    def __init__(self, output=None, modules=None, frame_pool_size=DEFAULT_FRAME_POOL_SIZE, budget=None):
+        self.output = output if output is not None else Output()
+        self.modules = modules if modules is not None else default_cache
+        # Paths of the modules being imported, innermost last, and environments of the imported modules by path.
+        self.importing = []
+        self.module_envs = {}
+        # Built-ins environments of the modules by the global environment that imports them.
+        self.module_builtins = {}
+        # Call environments of leaf functions that are free to reuse.
+        self.frames = []
+        self.frame_pool_size = frame_pool_size
+        # Allocation counters.
+        self.frames_created = 0
+        self.frames_reused = 0
+        # Loops and calls decrement `countdown` and call `check_budget` once it's negative. Without a budget it
+        # starts too high to ever get there, so the check costs a decrement and a comparison either way.
+        self.budget = budget
+        self.steps = 0
+        self.deadline = None
+        if budget is not None and budget.seconds is not None:
+            self.deadline = time.perf_counter() + budget.seconds
+        self._window = sys.maxsize if budget is None else self._next_window()
+        self.countdown = self._window
+        # Called by `check_budget` when set, even without a budget, raises to stop the evaluation between statements.
+        self.limit_check = None
+
+    def _next_window(self):
+        if self.budget is None:
+            return DEFAULT_BUDGET_CHECK_INTERVAL
+        window = self.budget.check_interval
+        if self.budget.steps is not None:
+            window = min(window, self.budget.steps - self.steps)
+        return window
+
+    def used_steps(self):
+        """Returns the number of steps taken so far."""
+        return self.steps + self._window - self.countdown
+
+    def remaining_budget(self):
+        """Returns a budget with the steps and the time left, or None without a budget."""
+        if self.budget is None:
+            return None
+        steps = seconds = None
+        if self.budget.steps is not None:
+            steps = max(0, self.budget.steps - self.used_steps())
+        if self.deadline is not None:
+            seconds = max(0.0, self.deadline - time.perf_counter())
+        return Budget(steps, seconds, self.budget.check_interval)
+
+    def set_limit_check(self, check):
+        """Makes `check_budget` call `check` every check interval of steps, with or without a budget."""
+        self.steps = self.used_steps()
+        self.limit_check = check
+        self._window = self.countdown = min(self.countdown, self._next_window())
+
+    def add_steps(self, steps):
+        """Counts `steps` taken outside of this context, by worker processes for example."""
+        self.countdown -= steps
+        if self.countdown < 0:
+            self.check_budget()
+
+    def check_budget(self):
+        """Raises BudgetExceededError if the budget is used up, otherwise starts counting the next steps."""
+        self.steps += self._window - self.countdown
+        if self.budget is None:
+            self._window = sys.maxsize if self.limit_check is None else self._next_window()
+        else:
+            if self.budget.steps is not None and self.steps > self.budget.steps:
+                raise BudgetExceededError('Step budget of {} exceeded'.format(self.budget.steps))
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise BudgetExceededError('Time budget of {} seconds exceeded'.format(self.budget.seconds))
+            self._window = self._next_window()
+        self.countdown = self._window
+        if self.limit_check is not None:
+            self.limit_check()
+
+
+# Used when built-ins are called outside of an evaluation.
+_default_context = Context(Output(buffer_size=0))
+_current_context = ContextVar('abrvalg_context', default=_default_context)
+
+
+def current_context():
+    return _current_context.get()
+
+
+@contextmanager
+def activate(context, flush=True):
+    """Makes `context` current for the duration of the block and flushes its output afterwards unless `flush` is off."""
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
+        if flush:
+            context.output.flush()
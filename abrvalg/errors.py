@@ -21,3 +21,11 @@ def report_syntax_error(lexer, error):
     source_line = lexer.source_lines[line - 1]
     print('Syntax error: {} at line {}, column {}'.format(error.message, line, column))
     print('{}\n{}^'.format(source_line, ' ' * (column - 1)))
+
+
+class MemoryLimitError(MemoryError):
+    """Raised when a script uses more memory than the limit it runs with."""
+
+
+class BudgetExceededError(Exception):
+    """Raised when a script takes more steps or time than its budget allows."""
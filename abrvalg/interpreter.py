@@ -6,17 +6,18 @@ AST-walking interpreter.
 """
 from __future__ import print_function
 import operator
-from collections import namedtuple
+from functools import lru_cache
 from abrvalg import ast
+from abrvalg.context import Context, Output, activate, current_context
 from abrvalg.lexer import Lexer, TokenStream
+from abrvalg.optimizer import SAFE_CALLS, optimize, persistent_literals
 from abrvalg.parser import Parser
+from abrvalg.persistent import Persistent, PVector, PMap
+from abrvalg.stdlib import BuiltinFunction, default_builtins, files, modules as stdlib_modules
 from abrvalg.errors import AbrvalgSyntaxError, report_syntax_error
 from abrvalg.utils import print_ast, print_tokens, print_env
 
 
-BuiltinFunction = namedtuple('BuiltinFunction', ['params', 'body'])
-
-
 class Break(Exception):
     pass
 
@@ -30,7 +31,21 @@ class Return(Exception):
         self.value = value
 
 
+class Closure(object):
+    """Function value, the function body is evaluated in a child of the environment the function was defined in."""
+    __slots__ = ('function', 'env')
+
+    def __init__(self, function, env):
+        self.function = function
+        self.env = env
+
+    def __repr__(self):
+        return '<function {}>'.format(self.function.name)
+
+
 class Environment(object):
+    # Set on global environments made with an allowlist, restricts file built-ins and imports.
+    allowlist = None
 
     def __init__(self, parent=None, args=None):
         self._parent = parent
@@ -55,6 +70,13 @@ class Environment(object):
     def asdict(self):
         return self._values
 
+    def root(self):
+        """Returns the environment at the top of the chain, the one with the built-ins."""
+        env = self
+        while env._parent is not None:
+            env = env._parent
+        return env
+
     def __repr__(self):
         return 'Environment({})'.format(str(self._values))
 
@@ -72,6 +94,8 @@ def eval_binary_operator(node, env):
         '<=': operator.le,
         '==': operator.eq,
         '!=': operator.ne,
+        'in': lambda item, collection: item in collection,
+        'not in': lambda item, collection: item not in collection,
         '..': range,
         '...': lambda start, end: range(start, end + 1),
     }
@@ -102,6 +126,41 @@ def eval_assignment(node, env):
         return env.set(node.left.value, eval_expression(node.right, env))
 
 
+def _add_in_place(left, right):
+    # Lists are only extended in place by lists, with other values `+=` raises TypeError like `+` does.
+    if isinstance(left, list) and not isinstance(right, list):
+        return left + right
+    return operator.iadd(left, right)
+
+
+augmented_operations = {
+    '+': _add_in_place,
+    '-': operator.isub,
+    '*': operator.imul,
+    '/': operator.itruediv,
+    '%': operator.imod,
+}
+
+
+def eval_augmented_assignment(node, env):
+    operation = augmented_operations[node.operator]
+    if isinstance(node.left, ast.SubscriptOperator):
+        path = eval_subscript_path(node.left, env)
+        collection, key = path[-1]
+        store_item(node.left, path, operation(collection[key], eval_expression(node.right, env)), env)
+    else:
+        env.set(node.left.value, operation(eval_identifier(node.left, env), eval_expression(node.right, env)))
+
+
+_safe_builtins = [(name, default_builtins()[name]) for name in SAFE_CALLS]
+
+
+def eval_guarded_append(node, env):
+    if all(env.get(name) is builtin for name, builtin in _safe_builtins):
+        return eval_augmented_assignment(node, env)
+    env.set(node.left.value, eval_binary_operator(ast.BinaryOperator('+', node.left, node.right), env))
+
+
 def eval_condition(node, env):
     if eval_expression(node.test, env):
         return eval_statements(node.if_body, env)
@@ -124,7 +183,11 @@ def eval_match(node, env):
 
 
 def eval_while_loop(node, env):
+    context = current_context()
     while eval_expression(node.test, env):
+        context.countdown -= 1
+        if context.countdown < 0:
+            context.check_budget()
         try:
             eval_statements(node.body, env)
         except Break:
@@ -136,7 +199,11 @@ def eval_while_loop(node, env):
 def eval_for_loop(node, env):
     var_name = node.var_name
     collection = eval_expression(node.collection, env)
+    context = current_context()
     for val in collection:
+        context.countdown -= 1
+        if context.countdown < 0:
+            context.check_budget()
         env.set(var_name, val)
         try:
             eval_statements(node.body, env)
@@ -147,24 +214,78 @@ def eval_for_loop(node, env):
 
 
 def eval_function_declaration(node, env):
-    return env.set(node.name, node)
+    return env.set(node.name, Closure(node, env))
 
 
-def eval_call(node, env):
-    function = eval_expression(node.left, env)
-    n_expected_args = len(function.params)
-    n_actual_args = len(node.arguments)
-    if n_expected_args != n_actual_args:
-        raise TypeError('Expected {} arguments, got {}'.format(n_expected_args, n_actual_args))
-    args = dict(zip(function.params, [eval_expression(node, env) for node in node.arguments]))
+def _bind_callback(function, env):
+    return lambda *arguments: call_function(function, arguments, env)
+
+
+def call_function(function, arguments, env):
+    """Calls an Abrvalg or built-in `function` with already evaluated `arguments` from the caller environment `env`."""
+    n_actual_args = len(arguments)
     if isinstance(function, BuiltinFunction):
+        params = function.params
+        n_expected_args = len(params)
+        n_required_args = n_expected_args - function.defaults
+        if not n_required_args <= n_actual_args <= n_expected_args:
+            if n_required_args != n_expected_args:
+                n_expected_args = '{} to {}'.format(n_required_args, n_expected_args)
+            raise TypeError('Expected {} arguments, got {}'.format(n_expected_args, n_actual_args))
+        args = dict(zip(params, arguments))
+        for name in function.callbacks:
+            if name in args:
+                args[name] = _bind_callback(args[name], env)
         return function.body(args, env)
+    node = function.function
+    params = node.params
+    if len(params) != n_actual_args:
+        raise TypeError('Expected {} arguments, got {}'.format(len(params), n_actual_args))
+    context = current_context()
+    context.countdown -= 1
+    if context.countdown < 0:
+        context.check_budget()
+    if type(node) is ast.LeafFunction:
+        return call_leaf_function(node, function.env, arguments, context)
+    context.frames_created += 1
+    # Scoping is lexical, the function body sees the environment it was defined in.
+    call_env = Environment(function.env, dict(zip(params, arguments)))
+    if isinstance(node, ast.GeneratorFunction):
+        return iter_generator(node, call_env)
+    elif isinstance(node, ast.AsyncFunction):
+        return run_coroutine(node, call_env)
+    try:
+        return eval_statements(node.body, call_env)
+    except Return as ret:
+        return ret.value
+
+
+def call_leaf_function(node, parent, arguments, context):
+    # Nothing can refer to the environment of a leaf function call after it returns, so it goes back to the pool.
+    frames = context.frames
+    if frames:
+        frame = frames.pop()
+        frame._parent = parent
+        context.frames_reused += 1
     else:
-        call_env = Environment(env, args)
-        try:
-            return eval_statements(function.body, call_env)
-        except Return as ret:
-            return ret.value
+        frame = Environment(parent)
+        context.frames_created += 1
+    values = frame._values
+    values.update(zip(node.params, arguments))
+    try:
+        return eval_statements(node.body, frame)
+    except Return as ret:
+        return ret.value
+    finally:
+        values.clear()
+        frame._parent = None
+        if len(frames) < context.frame_pool_size:
+            frames.append(frame)
+
+
+def eval_call(node, env):
+    function = eval_expression(node.left, env)
+    return call_function(function, [eval_expression(argument, env) for argument in node.arguments], env)
 
 
 def eval_identifier(node, env):
@@ -181,10 +302,35 @@ def eval_getitem(node, env):
     return collection[key]
 
 
+def eval_subscript_path(node, env):
+    """Evaluates subscript chain `a[k1][k2]` into a list of collections and their keys: [(a, k1), (a[k1], k2)]."""
+    if isinstance(node.left, ast.SubscriptOperator):
+        path = eval_subscript_path(node.left, env)
+        parent, parent_key = path[-1]
+        collection = parent[parent_key]
+    else:
+        path = []
+        collection = eval_expression(node.left, env)
+    path.append((collection, eval_expression(node.key, env)))
+    return path
+
+
+def store_item(node, path, value, env):
+    collection, key = path[-1]
+    if not isinstance(collection, Persistent):
+        collection[key] = value
+    elif len(path) > 1:
+        # Persistent collections can't be changed in place, the updated copy replaces the original.
+        store_item(node.left, path[:-1], collection.set(key, value), env)
+    elif isinstance(node.left, ast.Identifier):
+        env.set(node.left.value, collection.set(key, value))
+    else:
+        raise TypeError('Persistent collection item can only be assigned through a variable')
+
+
 def eval_setitem(node, env):
-    collection = eval_expression(node.left.left, env)
-    key = eval_expression(node.left.key, env)
-    collection[key] = eval_expression(node.right, env)
+    path = eval_subscript_path(node.left, env)
+    store_item(node.left, path, eval_expression(node.right, env), env)
 
 
 def eval_array(node, env):
@@ -195,6 +341,40 @@ def eval_dict(node, env):
     return {eval_expression(key, env): eval_expression(value, env) for key, value in node.items}
 
 
+def eval_set(node, env):
+    return {eval_expression(item, env) for item in node.items}
+
+
+def eval_vector(node, env):
+    return PVector(eval_expression(item, env) for item in node.items)
+
+
+def eval_hashmap(node, env):
+    return PMap((eval_expression(key, env), eval_expression(value, env)) for key, value in node.items)
+
+
+def _module_builtins(env, context):
+    # Modules see the built-ins of the importing script, restricted the same way, but not its globals. Modules
+    # importing modules share them too.
+    env = env.root()
+    builtins = context.module_builtins.get(env)
+    if builtins is None:
+        builtins = Environment(None, {name: value for name, value in env.asdict().items()
+                                      if isinstance(value, BuiltinFunction)})
+        builtins.allowlist = env.allowlist
+        context.module_builtins[env] = context.module_builtins[builtins] = builtins
+    return builtins
+
+
+def eval_import(node, env):
+    context = current_context()
+    module_env = context.modules.load(node.path, context, _module_builtins(env, context))
+    # Names starting with an underscore are private to the module, its functions still see them through closures.
+    for name, value in module_env.asdict().items():
+        if not name.startswith('_'):
+            env.set(name, value)
+
+
 def eval_return(node, env):
     return eval_expression(node.value, env) if node.value is not None else None
 
@@ -204,18 +384,27 @@ evaluators = {
     ast.String: lambda node, env: node.value,
     ast.Array: eval_array,
     ast.Dictionary: eval_dict,
+    ast.Set: eval_set,
+    ast.Vector: eval_vector,
+    ast.HashMap: eval_hashmap,
     ast.Identifier: eval_identifier,
     ast.BinaryOperator: eval_binary_operator,
     ast.UnaryOperator: eval_unary_operator,
     ast.SubscriptOperator: eval_getitem,
     ast.Assignment: eval_assignment,
+    ast.AugmentedAssignment: eval_augmented_assignment,
+    ast.GuardedAppend: eval_guarded_append,
     ast.Condition: eval_condition,
     ast.Match: eval_match,
     ast.WhileLoop: eval_while_loop,
     ast.ForLoop: eval_for_loop,
     ast.Function: eval_function_declaration,
+    ast.GeneratorFunction: eval_function_declaration,
+    ast.LeafFunction: eval_function_declaration,
+    ast.AsyncFunction: eval_function_declaration,
     ast.Call: eval_call,
     ast.Return: eval_return,
+    ast.Import: eval_import,
 }
 
 
@@ -248,25 +437,158 @@ def eval_statements(statements, env):
     return ret
 
 
-def add_builtins(env):
-    builtins = {
-        'print': (['value'], lambda args, e: print(args['value'])),
-        'len': (['iter'], lambda args, e: len(args['iter'])),
-        'slice': (['iter', 'start', 'stop'], lambda args, e: list(args['iter'][args['start']:args['stop']])),
-        'str': (['in'], lambda args, e: str(args['in'])),
-        'int': (['in'], lambda args, e: int(args['in'])),
-    }
-    for key, (params, func) in builtins.items():
-        env.set(key, BuiltinFunction(params, func))
+# Generator and async function bodies are evaluated by Python generators, so they can stop at `yield` or `await`
+# and resume later. Only statements that can contain `yield` or `await` have generator versions.
+
+def iter_condition(node, env):
+    if eval_expression(node.test, env):
+        return (yield from iter_statements(node.if_body, env))
+
+    for cond in node.elifs:
+        if eval_expression(cond.test, env):
+            return (yield from iter_statements(cond.body, env))
 
+    if node.else_body is not None:
+        return (yield from iter_statements(node.else_body, env))
+
+
+def iter_match(node, env):
+    test = eval_expression(node.test, env)
+    for pattern in node.patterns:
+        if eval_expression(pattern.pattern, env) == test:
+            return (yield from iter_statements(pattern.body, env))
+    if node.else_body is not None:
+        return (yield from iter_statements(node.else_body, env))
 
-def create_global_env():
+
+def iter_while_loop(node, env):
+    context = current_context()
+    while eval_expression(node.test, env):
+        context.countdown -= 1
+        if context.countdown < 0:
+            context.check_budget()
+        try:
+            yield from iter_statements(node.body, env)
+        except Break:
+            break
+        except Continue:
+            pass
+
+
+def iter_for_loop(node, env):
+    var_name = node.var_name
+    collection = eval_expression(node.collection, env)
+    context = current_context()
+    for val in collection:
+        context.countdown -= 1
+        if context.countdown < 0:
+            context.check_budget()
+        env.set(var_name, val)
+        try:
+            yield from iter_statements(node.body, env)
+        except Break:
+            break
+        except Continue:
+            pass
+
+
+def iter_yield(node, env):
+    yield eval_expression(node.value, env)
+
+
+def iter_await(node, env):
+    # The awaitable goes up to run_coroutine, which sends back its result.
+    return (yield eval_expression(node.value, env))
+
+
+def iter_assignment(node, env):
+    if not isinstance(node.right, ast.Await):
+        return eval_assignment(node, env)
+    value = yield from iter_await(node.right, env)
+    if isinstance(node.left, ast.SubscriptOperator):
+        store_item(node.left, eval_subscript_path(node.left, env), value, env)
+    else:
+        env.set(node.left.value, value)
+
+
+def iter_return(node, env):
+    if isinstance(node.value, ast.Await):
+        raise Return((yield from iter_await(node.value, env)))
+    raise Return(eval_return(node, env))
+
+
+generator_evaluators = {
+    ast.Condition: iter_condition,
+    ast.Match: iter_match,
+    ast.WhileLoop: iter_while_loop,
+    ast.ForLoop: iter_for_loop,
+    ast.Yield: iter_yield,
+    ast.Await: iter_await,
+    ast.Assignment: iter_assignment,
+    ast.Return: iter_return,
+}
+
+
+def iter_statements(statements, env):
+    ret = None
+    for statement in statements:
+        if isinstance(statement, ast.Break):
+            raise Break()
+        elif isinstance(statement, ast.Continue):
+            raise Continue()
+        evaluator = generator_evaluators.get(type(statement))
+        if evaluator is not None:
+            ret = yield from evaluator(statement, env)
+        else:
+            ret = eval_statement(statement, env)
+    return ret
+
+
+def iter_generator(function, env):
+    try:
+        yield from iter_statements(function.body, env)
+    except Return:
+        pass
+
+
+async def run_coroutine(function, env):
+    """Runs an async function body, awaiting each awaitable it stops at on the running event loop."""
+    body = iter_statements(function.body, env)
+    value = None
+    try:
+        while True:
+            value = await body.send(value)
+    except StopIteration as stop:
+        return stop.value
+    except Return as ret:
+        return ret.value
+
+
+def add_builtins(env, allowed_paths=None):
+    """Registers the default built-ins in `env`, and the file built-ins restricted to `allowed_paths` if given."""
+    for module in stdlib_modules:
+        module.register(env)
+    if allowed_paths is not None:
+        env.allowlist = files.Allowlist(allowed_paths)
+        files.create_module(env.allowlist).register(env)
+
+
+def create_global_env(allowed_paths=None):
     env = Environment()
-    add_builtins(env)
+    add_builtins(env, allowed_paths)
     return env
 
 
-def evaluate_env(s, env, verbose=False):
+def parse(source, persistent=False):
+    """Lexes, parses and optimizes `source`, raises `AbrvalgSyntaxError` if it's invalid."""
+    program = Parser().parse(TokenStream(Lexer().tokenize(source)))
+    program = optimize(program)
+    if persistent:
+        program = persistent_literals(program)
+    return program
+
+
+def evaluate_env(s, env, verbose=False, persistent=False, output=None, modules=None, budget=None):
     lexer = Lexer()
     try:
         tokens = lexer.tokenize(s)
@@ -293,12 +615,17 @@ def evaluate_env(s, env, verbose=False):
         else:
             return
 
+    program = optimize(program)
+    if persistent:
+        program = persistent_literals(program)
+
     if verbose:
         print('AST')
         print_ast(program.body)
         print()
 
-    ret = eval_statements(program.body, env)
+    with activate(Context(output, modules, budget=budget)):
+        ret = eval_statements(program.body, env)
 
     if verbose:
         print('Environment')
@@ -308,5 +635,87 @@ def evaluate_env(s, env, verbose=False):
     return ret
 
 
-def evaluate(s, verbose=False):
-    return evaluate_env(s, create_global_env(), verbose)
+def evaluate(s, verbose=False, persistent=False, output=None, modules=None, budget=None):
+    return evaluate_env(s, create_global_env(), verbose, persistent, output, modules, budget)
+
+
+class CompiledProgram(object):
+    """Program that is lexed, parsed and optimized once and can be evaluated any number of times."""
+
+    def __init__(self, program, builtins, modules=None):
+        self.program = program
+        self.builtins = builtins
+        self.modules = modules
+
+    def create_env(self, bindings=None):
+        return Environment(self.builtins, bindings)
+
+    def run(self, bindings=None, output=None, env=None, budget=None):
+        """
+        Evaluates the program with `bindings` as globals, or in a global environment `env` made by `create_env`, and
+        returns the value of the last statement. Raises BudgetExceededError if the run goes over `budget`.
+        """
+        if env is None:
+            env = self.create_env(bindings)
+        with activate(Context(output, self.modules, budget=budget)):
+            return eval_statements(self.program.body, env)
+
+    def run_many(self, records, output=None, budget=None):
+        """
+        Lazily evaluates the program once per bindings of `records`, yielding the results in order. Records are
+        independent, each one gets its own context with its own imported modules and the whole `budget`. They share
+        the output, which is flushed at the end.
+        """
+        body = self.program.body
+        output = output if output is not None else Output()
+        try:
+            for bindings in records:
+                with activate(Context(output, self.modules, budget=budget), flush=False):
+                    result = eval_statements(body, Environment(self.builtins, bindings))
+                yield result
+        finally:
+            output.flush()
+
+
+class Interpreter(object):
+    """
+    Runs Abrvalg programs for an embedding application. The compiled programs and the built-ins are shared and never
+    change, every run gets its own global environment and context, so one interpreter can run many scripts at once
+    from several threads.
+    """
+
+    def __init__(self, allowed_paths=None, persistent=False, cache_size=128, modules=None):
+        self.persistent = persistent
+        self.builtins = create_global_env(allowed_paths)
+        self.modules = modules
+        self._cached_parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    def _parse(self, source):
+        return parse(source, self.persistent)
+
+    def parse(self, source):
+        """Returns the program of `source`, raises `AbrvalgSyntaxError` if it's invalid."""
+        return self._cached_parse(source)
+
+    def compile(self, source):
+        return CompiledProgram(self.parse(source), self.builtins, self.modules)
+
+    def create_env(self):
+        """Creates a global environment for a run, built-ins are looked up in the shared parent environment."""
+        return Environment(self.builtins)
+
+    def run(self, source, env=None, output=None, budget=None):
+        """
+        Evaluates `source` in `env` or a new global environment and returns the value of the last statement. Raises
+        BudgetExceededError if the run goes over `budget`.
+        """
+        program = self.parse(source)
+        if env is None:
+            env = self.create_env()
+        with activate(Context(output, self.modules, budget=budget)):
+            return eval_statements(program.body, env)
+
+
+def compile(source, persistent=False, allowed_paths=None):
+    """Compiles `source` into a program that can be run against many sets of global bindings."""
+    return Interpreter(allowed_paths, persistent).compile(source)
@@ -54,6 +54,7 @@ class Lexer(object):
         ('NAME', r'[a-zA-Z_]\w*'),
         ('WHITESPACE', '[ \t]+'),
         ('NEWLINE', r'\n+'),
+        ('AUG_ASSIGN', r'[\+\*\-\/%]='),    # augmented assignment
         ('OPERATOR', r'[\+\*\-\/%]'),       # arithmetic operators
         ('OPERATOR', r'<=|>=|==|!=|<|>'),   # comparison operators
         ('OPERATOR', r'\|\||&&'),           # boolean operators
@@ -72,7 +73,11 @@ class Lexer(object):
 
     keywords = {
         'func': 'FUNCTION',
+        'async': 'ASYNC',
+        'await': 'AWAIT',
         'return': 'RETURN',
+        'yield': 'YIELD',
+        'import': 'IMPORT',
         'else': 'ELSE',
         'elif': 'ELIF',
         'if': 'IF',
@@ -81,6 +86,7 @@ class Lexer(object):
         'continue': 'CONTINUE',
         'for': 'FOR',
         'in': 'IN',
+        'not': 'NOT',
         'match': 'MATCH',
         'when': 'WHEN',
     }
@@ -95,9 +101,15 @@ class Lexer(object):
         'NUMBER': decode_num,
     }
 
+    # Compiled rules shared by all lexers with the same rules, compiled patterns can be used from several threads.
+    _regex_cache = {}
+
     def __init__(self):
         self.source_lines = []
-        self._regex = self._compile_rules(self.rules)
+        rules = tuple(self.rules)
+        self._regex = self._regex_cache.get(rules)
+        if self._regex is None:
+            self._regex = self._regex_cache[rules] = self._compile_rules(rules)
 
     def _convert_rules(self, rules):
         grouped_rules = OrderedDict()
@@ -143,6 +155,7 @@ class Lexer(object):
             return line[0] * self._count_leading_characters(line, line[0])
 
     def tokenize(self, s):
+        self.source_lines = []
         indent_symbol = None
         tokens = []
         last_indent_level = 0
@@ -0,0 +1,99 @@
+"""
+Modules
+-------
+
+Modules are Abrvalg files loaded by the `import "path.abr"` statement. A module is parsed once and cached by its
+resolved path, it's parsed again only when the file changes. Every evaluation runs the modules it imports in its own
+environments, with the built-ins and the allowlist of the importing script, so module globals are never shared
+between runs. Scripts without an allowlist can only import modules inside the search path. Importing copies the
+module's global names that don't start with an underscore into the importing environment.
+"""
+import os
+import threading
+
+SEARCH_PATH_VARIABLE = 'ABRVALG_PATH'
+
+
+def default_search_path():
+    """Directories of the ABRVALG_PATH environment variable followed by the current directory."""
+    paths = os.environ.get(SEARCH_PATH_VARIABLE)
+    return (paths.split(os.pathsep) if paths else []) + [os.curdir]
+
+
+class ModuleCache(object):
+    """
+    Parsed modules by resolved path. Relative module names are looked up in the directory of the importing module
+    and then in `search_path`.
+    """
+
+    def __init__(self, search_path=None, persistent=False):
+        self.search_path = list(search_path) if search_path is not None else default_search_path()
+        self.persistent = persistent
+        self._programs = {}
+        self._lock = threading.Lock()
+
+    def find(self, name, directory=None, allowlist=None):
+        """
+        Returns the resolved path of module `name`. Paths outside of `allowlist`, or of the search path without
+        one, are skipped and PermissionError is raised if the module only exists there.
+        """
+        if allowlist is None:
+            from abrvalg.stdlib.files import Allowlist
+            allowlist = Allowlist(self.search_path)
+        directories = ([directory] if directory is not None else []) + self.search_path
+        denied = False
+        for directory in directories:
+            # Absolute names ignore the directory.
+            path = os.path.join(directory, name)
+            if allowlist is not None and not allowlist.allows(path):
+                denied = denied or os.path.isfile(path)
+            elif os.path.isfile(path):
+                return os.path.realpath(path)
+        if denied:
+            raise PermissionError('Import of module "{}" is not allowed'.format(name))
+        raise ImportError('Module "{}" not found'.format(name))
+
+    def load(self, name, context, builtins):
+        """
+        Returns the environment of module `name` imported in `context`, evaluating the module in a child of
+        `builtins` the first time the context imports it.
+        """
+        directory = os.path.dirname(context.importing[-1]) if context.importing else None
+        path = self.find(name, directory, builtins.allowlist)
+        env = context.module_envs.get(path)
+        if env is not None:
+            return env
+        if path in context.importing:
+            raise ImportError('Circular import of module "{}"'.format(name))
+        program = self._parse(path)
+        # Imported here, the interpreter imports this module.
+        from abrvalg.interpreter import Environment, eval_statements
+        env = Environment(builtins)
+        context.importing.append(path)
+        try:
+            eval_statements(program.body, env)
+        finally:
+            context.importing.pop()
+        context.module_envs[path] = env
+        return env
+
+    def _parse(self, path):
+        from abrvalg.interpreter import parse
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._programs.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path) as f:
+            program = parse(f.read(), self.persistent)
+        with self._lock:
+            self._programs[path] = (mtime, program)
+        return program
+
+    def clear(self):
+        with self._lock:
+            self._programs.clear()
+
+
+# Shared by all evaluations that don't use their own cache.
+default_cache = ModuleCache()
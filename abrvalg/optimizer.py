@@ -0,0 +1,159 @@
+"""
+Optimizer
+---------
+
+AST rewrites applied between parsing and evaluation.
+"""
+from abrvalg import ast
+
+# Built-ins that can't keep or return their arguments, so calling them doesn't alias an array.
+SAFE_CALLS = frozenset(['len'])
+
+
+def _is_name(node, name):
+    return isinstance(node, ast.Identifier) and node.value == name
+
+
+def _appended_name(node):
+    # name = name + [...]
+    if (isinstance(node, ast.Assignment) and isinstance(node.left, ast.Identifier) and
+            isinstance(node.right, ast.BinaryOperator) and node.right.operator == '+' and
+            _is_name(node.right.left, node.left.value) and isinstance(node.right.right, ast.Array)):
+        return node.left.value
+
+
+def _bound_names(program):
+    names = set()
+    for node in ast.walk(program):
+        if isinstance(node, (ast.Assignment, ast.AugmentedAssignment)) and isinstance(node.left, ast.Identifier):
+            names.add(node.left.value)
+        elif isinstance(node, ast.ForLoop):
+            names.add(node.var_name)
+        elif isinstance(node, ast.Function):
+            names.add(node.name)
+            names.update(node.params)
+    return names
+
+
+def _mentions(node, name):
+    for n in ast.walk(node):
+        if _is_name(n, name) or getattr(n, 'var_name', None) == name or getattr(n, 'name', None) == name:
+            return True
+    return False
+
+
+def _uses_are_safe(node, name, safe_calls):
+    """Checks that `node` uses `name` only in ways that can't alias or observe the identity of its value."""
+    if _appended_name(node) == name:
+        return _uses_are_safe(node.right.right, name, safe_calls)
+    elif isinstance(node, ast.Assignment) and _is_name(node.left, name):
+        return isinstance(node.right, ast.Array) and _uses_are_safe(node.right, name, safe_calls)
+    elif isinstance(node, ast.AugmentedAssignment) and _is_name(node.left, name):
+        return node.operator == '+' and _uses_are_safe(node.right, name, safe_calls)
+    elif isinstance(node, ast.SubscriptOperator) and _is_name(node.left, name):
+        return _uses_are_safe(node.key, name, safe_calls)
+    elif isinstance(node, ast.Return) and _is_name(node.value, name):
+        return True
+    elif (isinstance(node, ast.Call) and isinstance(node.left, ast.Identifier) and node.left.value in safe_calls and
+            len(node.arguments) == 1 and _is_name(node.arguments[0], name)):
+        return True
+    elif isinstance(node, ast.Function):
+        # Nested function bodies are checked as separate functions.
+        return node.name != name
+    elif isinstance(node, ast.ForLoop) and node.var_name == name:
+        return False
+    elif _is_name(node, name):
+        return False
+    return all(_uses_are_safe(child, name, safe_calls) for child in ast.iter_child_nodes(node))
+
+
+def _is_unaliased(function, name, safe_calls):
+    """
+    Checks that every value `name` holds inside `function` is a fresh array that never escapes while the function
+    still modifies it.
+    """
+    body = function.body
+    # The first statement that mentions the name must unconditionally bind it to a new array,
+    # otherwise the function could append to an array of an enclosing scope.
+    first = next((statement for statement in body if _mentions(statement, name)), None)
+    if not (isinstance(first, ast.Assignment) and _is_name(first.left, name) and isinstance(first.right, ast.Array)):
+        return False
+    # The value of the last expression is the return value of the function.
+    if _is_name(body[-1], name):
+        body = body[:-1]
+    return all(_uses_are_safe(statement, name, safe_calls) for statement in body)
+
+
+def _transform(node, visit, skip=()):
+    """Rebuilds `node` bottom-up, replacing each node with `visit(node)`. Nodes of `skip` types are left as is."""
+    if isinstance(node, list):
+        return [_transform(child, visit, skip) for child in node]
+    elif isinstance(node, skip):
+        return node
+    elif hasattr(node, '_fields'):
+        replaced = node._replace(**{field: _transform(getattr(node, field), visit, skip) for field in node._fields})
+        return ast.copy_location(visit(ast.copy_location(replaced, node)), node)
+    elif isinstance(node, tuple):
+        return tuple(_transform(child, visit, skip) for child in node)
+    return node
+
+
+def _read_by_nested_function(function, name):
+    # Scoping is lexical, only functions defined inside `function` can see its variables.
+    return any(_mentions(node, name) for node in ast.walk(function.body) if isinstance(node, ast.Function))
+
+
+def _optimize_function(function, safe_calls):
+    appended = set(_appended_name(node) for node in ast.walk(function.body, nested_functions=False))
+    appended -= {None} | set(function.params)
+    names = set(name for name in appended
+                if not _read_by_nested_function(function, name) and _is_unaliased(function, name, safe_calls))
+    if names:
+        # Modules and globals set by the embedding program can still shadow a safe call when the function runs.
+        guarded = any(isinstance(node, ast.Call) and isinstance(node.left, ast.Identifier) and
+                      node.left.value in safe_calls for node in ast.walk(function.body, nested_functions=False))
+        append = ast.GuardedAppend if guarded else ast.AugmentedAssignment
+
+        def rewrite(node):
+            if _appended_name(node) in names:
+                return append('+', node.left, node.right.right)
+            return node
+        function = function._replace(body=_transform(function.body, rewrite, skip=ast.Function))
+    return function
+
+
+def _is_leaf(function):
+    # Only closures of nested functions and suspended generators keep a call environment after the call returns.
+    return (type(function) is ast.Function and
+            not any(isinstance(node, ast.Function) for node in ast.walk(function.body)))
+
+
+def optimize(program):
+    """
+    Rewrites `x = x + [...]` inside functions into in-place `x += [...]` when `x` provably holds a fresh array that
+    nothing else can observe, turning quadratic array building into amortized linear. Marks functions whose call
+    environments can be reused as leaf functions.
+    """
+    safe_calls = SAFE_CALLS - _bound_names(program)
+
+    def optimize_function(node):
+        if isinstance(node, ast.Function):
+            node = _optimize_function(node, safe_calls)
+            if _is_leaf(node):
+                node = ast.LeafFunction(*node)
+        return node
+
+    return _transform(program, optimize_function)
+
+
+def _persistent_literal(node):
+    if isinstance(node, ast.Array):
+        return ast.Vector(node.items)
+    elif isinstance(node, ast.Dictionary):
+        return ast.HashMap(node.items)
+    return node
+
+
+def persistent_literals(program):
+    """Makes array and dictionary literals produce persistent vectors and dictionaries."""
+    return _transform(program, _persistent_literal)
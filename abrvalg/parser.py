@@ -26,6 +26,15 @@ def enter_scope(parser, name):
     return State()
 
 
+def in_async_function(parser):
+    # Only the innermost function counts, a plain function nested in an async one can't await.
+    scope = parser.scope
+    if 'function' not in scope:
+        return False
+    index = len(scope) - 1 - scope[::-1].index('function')
+    return index > 0 and scope[index - 1] == 'async'
+
+
 class Subparser(object):
 
     PRECEDENCE = {
@@ -45,6 +54,7 @@ class Subparser(object):
         '>=': 5,
         '<': 5,
         '<=': 5,
+        'in': 5,
 
         '==': 4,
         '!=': 4,
@@ -143,27 +153,33 @@ class ArrayExpression(PrefixSubparser):
 # dict_expr: LCBRACK (expr COLON expr COMMA)* RCBRACK
 class DictionaryExpression(PrefixSubparser):
 
-    def _parse_keyvals(self, parser, tokens):
+    def _parse_keyvals(self, parser, tokens, key):
         items = []
-        while not tokens.is_end():
-            key = Expression().parse(parser, tokens)
-            if key is not None:
-                tokens.consume_expected('COLON')
-                value = Expression().parse(parser, tokens)
-                if value is None:
-                    raise ParserError('Dictionary value expected', tokens.consume())
-                items.append((key, value))
-            else:
-                break
+        while key is not None:
+            tokens.consume_expected('COLON')
+            value = Expression().parse(parser, tokens)
+            if value is None:
+                raise ParserError('Dictionary value expected', tokens.consume())
+            items.append((key, value))
             if tokens.current().name == 'COMMA':
                 tokens.consume_expected('COMMA')
+                key = Expression().parse(parser, tokens)
             else:
                 break
         return items
 
     def parse(self, parser, tokens):
         tokens.consume_expected('LCBRACK')
-        items = self._parse_keyvals(parser, tokens)
+        key = Expression().parse(parser, tokens)
+        # set_expr: LCBRACK expr (COMMA list_of_expr)? RCBRACK
+        if key is not None and tokens.current().name != 'COLON':
+            items = [key]
+            if tokens.current().name == 'COMMA':
+                tokens.consume_expected('COMMA')
+                items.extend(ListOfExpressions().parse(parser, tokens))
+            tokens.consume_expected('RCBRACK')
+            return ast.Set(items)
+        items = self._parse_keyvals(parser, tokens, key)
         tokens.consume_expected('RCBRACK')
         return ast.Dictionary(items)
 
@@ -182,6 +198,24 @@ class BinaryOperatorExpression(InfixSubparser):
         return self.PRECEDENCE[token.value]
 
 
+# membership_expr: expr NOT? IN expr
+class MembershipExpression(InfixSubparser):
+
+    def parse(self, parser, tokens, left):
+        operator = 'in'
+        if tokens.current().name == 'NOT':
+            tokens.consume_expected('NOT')
+            operator = 'not in'
+        token = tokens.consume_expected('IN')
+        right = Expression().parse(parser, tokens, self.get_precedence(token))
+        if right is None:
+            raise ParserError('Expected expression', tokens.consume())
+        return ast.BinaryOperator(operator, left, right)
+
+    def get_precedence(self, token):
+        return self.PRECEDENCE['in']
+
+
 # call_expr: NAME LPAREN list_of_expr? RPAREN
 class CallExpression(InfixSubparser):
 
@@ -210,6 +244,14 @@ class SubscriptOperatorExpression(InfixSubparser):
         return self.PRECEDENCE['subscript']
 
 
+# misplaced_await_expr: AWAIT
+class MisplacedAwaitExpression(PrefixSubparser):
+
+    def parse(self, parser, tokens):
+        raise ParserError('Await can only be used as a statement, an assignment value or a return value',
+                          tokens.current())
+
+
 # expr: number_expr | str_expr | name_expr | group_expr | array_expr | dict_expr | prefix_expr | infix_expr | call_expr
 #     | subscript_expr
 class Expression(Subparser):
@@ -223,11 +265,14 @@ class Expression(Subparser):
             'LBRACK': ArrayExpression,
             'LCBRACK': DictionaryExpression,
             'OPERATOR': UnaryOperatorExpression,
+            'AWAIT': MisplacedAwaitExpression,
         })
 
     def get_infix_subparser(self, token):
         return self.get_subparser(token, {
             'OPERATOR': BinaryOperatorExpression,
+            'IN': MembershipExpression,
+            'NOT': MembershipExpression,
             'LPAREN': CallExpression,
             'LBRACK': SubscriptOperatorExpression,
         })
@@ -252,6 +297,28 @@ class Expression(Subparser):
                 return left
 
 
+# await_expr: AWAIT expr
+class AwaitExpression(Subparser):
+
+    def parse(self, parser, tokens):
+        token = tokens.consume_expected('AWAIT')
+        if not in_async_function(parser):
+            raise ParserError('Await outside of async function', token)
+        value = Expression().parse(parser, tokens)
+        if value is None:
+            raise ParserError('Expected expression', tokens.current())
+        return ast.Await(value)
+
+
+# value_expr: await_expr | expr
+class ValueExpression(Subparser):
+
+    def parse(self, parser, tokens):
+        if tokens.current().name == 'AWAIT':
+            return AwaitExpression().parse(parser, tokens)
+        return Expression().parse(parser, tokens)
+
+
 # list_of_expr: (expr COMMA)*
 class ListOfExpressions(Subparser):
 
@@ -306,9 +373,26 @@ class FunctionStatement(Subparser):
             block = Block().parse(parser, tokens)
         if block is None:
             raise ParserError('Expected function body', tokens.current())
+        # Yields of nested functions belong to them.
+        if any(isinstance(node, ast.Yield) for node in ast.walk(block, nested_functions=False)):
+            return ast.GeneratorFunction(id_token.value, arguments, block)
         return ast.Function(id_token.value, arguments, block)
 
 
+# async_func_stmnt: ASYNC func_stmnt
+class AsyncFunctionStatement(Subparser):
+
+    def parse(self, parser, tokens):
+        token = tokens.consume_expected('ASYNC')
+        if tokens.current().name != 'FUNCTION':
+            raise ParserError('Expected function after `async`', tokens.current())
+        with enter_scope(parser, 'async'):
+            function = FunctionStatement().parse(parser, tokens)
+        if isinstance(function, ast.GeneratorFunction):
+            raise ParserError('Yield inside async function', token)
+        return ast.AsyncFunction(*function)
+
+
 # cond_stmnt: IF expr COLON block (ELIF COLON block)* (ELSE COLON block)?
 class ConditionalStatement(Subparser):
 
@@ -413,18 +497,42 @@ class ForLoopStatement(Subparser):
         return ast.ForLoop(id_token.value, collection, block)
 
 
-# return_stmnt: RETURN expr?
+# return_stmnt: RETURN value_expr?
 class ReturnStatement(Subparser):
 
     def parse(self, parser, tokens):
         if not parser.scope or 'function' not in parser.scope:
             raise ParserError('Return outside of function', tokens.current())
         tokens.consume_expected('RETURN')
-        value = Expression().parse(parser, tokens)
+        value = ValueExpression().parse(parser, tokens)
         tokens.consume_expected('NEWLINE')
         return ast.Return(value)
 
 
+# yield_stmnt: YIELD expr NEWLINE
+class YieldStatement(Subparser):
+
+    def parse(self, parser, tokens):
+        if not parser.scope or 'function' not in parser.scope:
+            raise ParserError('Yield outside of function', tokens.current())
+        tokens.consume_expected('YIELD')
+        value = Expression().parse(parser, tokens)
+        if value is None:
+            raise ParserError('Expected expression', tokens.current())
+        tokens.consume_expected('NEWLINE')
+        return ast.Yield(value)
+
+
+# import_stmnt: IMPORT STRING NEWLINE
+class ImportStatement(Subparser):
+
+    def parse(self, parser, tokens):
+        tokens.consume_expected('IMPORT')
+        path_token = tokens.consume_expected('STRING')
+        tokens.consume_expected('NEWLINE')
+        return ast.Import(path_token.value)
+
+
 # break_stmnt: BREAK
 class BreakStatement(Subparser):
 
@@ -445,25 +553,47 @@ class ContinueStatement(Subparser):
         return ast.Continue()
 
 
-# assing_stmnt: expr ASSIGN expr NEWLINE
+# assing_stmnt: expr ASSIGN value_expr NEWLINE
 class AssignmentStatement(Subparser):
 
     def parse(self, parser, tokens, left):
         tokens.consume_expected('ASSIGN')
-        right = Expression().parse(parser, tokens)
+        right = ValueExpression().parse(parser, tokens)
         tokens.consume_expected('NEWLINE')
         return ast.Assignment(left, right)
 
 
+# aug_assign_stmnt: expr AUG_ASSIGN expr NEWLINE
+class AugmentedAssignmentStatement(Subparser):
+
+    def parse(self, parser, tokens, left):
+        token = tokens.consume_expected('AUG_ASSIGN')
+        if not isinstance(left, (ast.Identifier, ast.SubscriptOperator)):
+            raise ParserError('Invalid augmented assignment target', token)
+        right = Expression().parse(parser, tokens)
+        if right is None:
+            raise ParserError('Expected expression', tokens.current())
+        tokens.consume_expected('NEWLINE')
+        return ast.AugmentedAssignment(token.value[:-1], left, right)
+
+
 # expr_stmnt: assing_stmnt
+#           | aug_assign_stmnt
+#           | await_expr NEWLINE
 #           | expr NEWLINE
 class ExpressionStatement(Subparser):
 
     def parse(self, parser, tokens):
+        if tokens.current().name == 'AWAIT':
+            exp = AwaitExpression().parse(parser, tokens)
+            tokens.consume_expected('NEWLINE')
+            return exp
         exp = Expression().parse(parser, tokens)
         if exp is not None:
             if tokens.current().name == 'ASSIGN':
                 return AssignmentStatement().parse(parser, tokens, exp)
+            elif tokens.current().name == 'AUG_ASSIGN':
+                return AugmentedAssignmentStatement().parse(parser, tokens, exp)
             else:
                 tokens.consume_expected('NEWLINE')
                 return exp
@@ -475,11 +605,14 @@ class Statements(Subparser):
     def get_statement_subparser(self, token):
         return self.get_subparser(token, {
             'FUNCTION': FunctionStatement,
+            'ASYNC': AsyncFunctionStatement,
             'IF': ConditionalStatement,
             'MATCH': MatchStatement,
             'WHILE': WhileLoopStatement,
             'FOR': ForLoopStatement,
             'RETURN': ReturnStatement,
+            'YIELD': YieldStatement,
+            'IMPORT': ImportStatement,
             'BREAK': BreakStatement,
             'CONTINUE': ContinueStatement,
         }, ExpressionStatement)
@@ -487,9 +620,10 @@ class Statements(Subparser):
     def parse(self, parser, tokens):
         statements = []
         while not tokens.is_end():
-            statement = self.get_statement_subparser(tokens.current()).parse(parser, tokens)
+            token = tokens.current()
+            statement = self.get_statement_subparser(token).parse(parser, tokens)
             if statement is not None:
-                statements.append(statement)
+                statements.append(statement._replace(line=token.line))
             else:
                 break
         return statements
@@ -0,0 +1,341 @@
+"""
+Persistent
+----------
+
+Persistent (immutable, structurally shared) collections: a vector backed by a 32-way trie with a tail buffer and a
+dictionary backed by a hash array mapped trie. Updates return new collections in O(log n) and share unchanged
+nodes with the original.
+"""
+from collections.abc import Mapping, Sequence
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+HASH_BITS = 32
+HASH_MASK = (1 << HASH_BITS) - 1
+
+
+class Persistent(object):
+    """Base class of collections that return an updated copy from `set` instead of changing themselves."""
+
+    def set(self, key, value):
+        raise NotImplementedError()
+
+
+def _new_path(level, node):
+    while level > 0:
+        node = [node]
+        level -= BITS
+    return node
+
+
+class PVector(Persistent, Sequence):
+
+    def __init__(self, items=()):
+        self._count = 0
+        self._shift = BITS
+        self._root = []
+        self._tail = []
+        for item in items:
+            self._append_in_place(item)
+
+    @classmethod
+    def _make(cls, count, shift, root, tail):
+        vector = cls.__new__(cls)
+        vector._count = count
+        vector._shift = shift
+        vector._root = root
+        vector._tail = tail
+        return vector
+
+    def _tail_offset(self):
+        return 0 if self._count < WIDTH else ((self._count - 1) >> BITS) << BITS
+
+    def _leaf_for(self, index):
+        if index >= self._tail_offset():
+            return self._tail
+        node = self._root
+        for level in range(self._shift, 0, -BITS):
+            node = node[(index >> level) & MASK]
+        return node
+
+    def _push_tail(self, level, parent, tail):
+        index = ((self._count - 1) >> level) & MASK
+        node = list(parent)
+        if level == BITS:
+            child = tail
+        elif index < len(parent):
+            child = self._push_tail(level - BITS, parent[index], tail)
+        else:
+            child = _new_path(level - BITS, tail)
+        if index < len(node):
+            node[index] = child
+        else:
+            node.append(child)
+        return node
+
+    def _with_tail_pushed(self):
+        # Moves a full tail into the trie, growing the trie by one level when the root overflows.
+        if (self._count >> BITS) > (1 << self._shift):
+            return [self._root, _new_path(self._shift, self._tail)], self._shift + BITS
+        return self._push_tail(self._shift, self._root, self._tail), self._shift
+
+    def _append_in_place(self, value):
+        # Only used while building a vector that nobody else can see yet.
+        if self._count - self._tail_offset() < WIDTH:
+            self._tail.append(value)
+        else:
+            self._root, self._shift = self._with_tail_pushed()
+            self._tail = [value]
+        self._count += 1
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('Vector index out of range')
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PVector(self[i] for i in range(*index.indices(self._count)))
+        index = self._check_index(index)
+        return self._leaf_for(index)[index & MASK]
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for start in range(0, self._count, WIDTH):
+            for value in self._leaf_for(start):
+                yield value
+
+    def __eq__(self, other):
+        if not isinstance(other, (PVector, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __add__(self, other):
+        return self.extend(other)
+
+    def __radd__(self, other):
+        return PVector(other).extend(self)
+
+    def __repr__(self):
+        return 'vector({})'.format(list(self))
+
+    def append(self, value):
+        """Returns a new vector with `value` added to the end."""
+        if self._count - self._tail_offset() < WIDTH:
+            return PVector._make(self._count + 1, self._shift, self._root, self._tail + [value])
+        root, shift = self._with_tail_pushed()
+        return PVector._make(self._count + 1, shift, root, [value])
+
+    def extend(self, values):
+        """Returns a new vector with `values` added to the end."""
+        vector = PVector._make(self._count, self._shift, self._root, list(self._tail))
+        for value in values:
+            vector._append_in_place(value)
+        return vector
+
+    def _assoc(self, level, node, index, value):
+        node = list(node)
+        if level == 0:
+            node[index & MASK] = value
+        else:
+            subindex = (index >> level) & MASK
+            node[subindex] = self._assoc(level - BITS, node[subindex], index, value)
+        return node
+
+    def set(self, index, value):
+        """Returns a new vector with the item at `index` replaced by `value`."""
+        if index == self._count:
+            return self.append(value)
+        index = self._check_index(index)
+        if index >= self._tail_offset():
+            tail = list(self._tail)
+            tail[index & MASK] = value
+            return PVector._make(self._count, self._shift, self._root, tail)
+        return PVector._make(self._count, self._shift, self._assoc(self._shift, self._root, index, value), self._tail)
+
+
+def _bit(h, shift):
+    return 1 << ((h >> shift) & MASK)
+
+
+def _index(bitmap, bit):
+    return bin(bitmap & (bit - 1)).count('1')
+
+
+def _hash(key):
+    return hash(key) & HASH_MASK
+
+
+def _merge_leaves(shift, leaf1, hash1, leaf2, hash2):
+    if hash1 == hash2 or shift >= HASH_BITS:
+        return _CollisionNode(hash1, [leaf1, leaf2])
+    bit1 = _bit(hash1, shift)
+    bit2 = _bit(hash2, shift)
+    if bit1 == bit2:
+        return _BitmapNode(bit1, [_merge_leaves(shift + BITS, leaf1, hash1, leaf2, hash2)])
+    entries = [leaf1, leaf2] if bit1 < bit2 else [leaf2, leaf1]
+    return _BitmapNode(bit1 | bit2, entries)
+
+
+class _BitmapNode(object):
+    # Entries are either (key, value) tuples or child nodes, ordered by their bit in the bitmap.
+    __slots__ = ('bitmap', 'entries')
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+    def find(self, shift, h, key):
+        bit = _bit(h, shift)
+        if not self.bitmap & bit:
+            return None
+        entry = self.entries[_index(self.bitmap, bit)]
+        if type(entry) is tuple:
+            return entry if entry[0] == key else None
+        return entry.find(shift + BITS, h, key)
+
+    def assoc(self, shift, h, key, value):
+        bit = _bit(h, shift)
+        index = _index(self.bitmap, bit)
+        entries = list(self.entries)
+        if not self.bitmap & bit:
+            entries.insert(index, (key, value))
+            return _BitmapNode(self.bitmap | bit, entries)
+        entry = entries[index]
+        if type(entry) is not tuple:
+            entries[index] = entry.assoc(shift + BITS, h, key, value)
+        elif entry[0] == key:
+            entries[index] = (key, value)
+        else:
+            entries[index] = _merge_leaves(shift + BITS, entry, _hash(entry[0]), (key, value), h)
+        return _BitmapNode(self.bitmap, entries)
+
+    def without(self, shift, h, key):
+        bit = _bit(h, shift)
+        index = _index(self.bitmap, bit)
+        entries = list(self.entries)
+        entry = entries[index]
+        if type(entry) is tuple:
+            child = None
+        else:
+            child = entry.without(shift + BITS, h, key)
+        if child is None:
+            del entries[index]
+            return _BitmapNode(self.bitmap & ~bit, entries) if entries else None
+        entries[index] = child
+        return _BitmapNode(self.bitmap, entries)
+
+    def iter_entries(self):
+        stack = [self]
+        while stack:
+            for entry in stack.pop().entries:
+                if type(entry) is tuple:
+                    yield entry
+                elif isinstance(entry, _CollisionNode):
+                    for item in entry.items:
+                        yield item
+                else:
+                    stack.append(entry)
+
+
+class _CollisionNode(object):
+    # Entries whose keys have equal hashes.
+    __slots__ = ('hash', 'items')
+
+    def __init__(self, h, items):
+        self.hash = h
+        self.items = items
+
+    def find(self, shift, h, key):
+        if h == self.hash:
+            for item in self.items:
+                if item[0] == key:
+                    return item
+        return None
+
+    def assoc(self, shift, h, key, value):
+        if h != self.hash:
+            return _BitmapNode(_bit(self.hash, shift), [self]).assoc(shift, h, key, value)
+        items = [item for item in self.items if item[0] != key]
+        items.append((key, value))
+        return _CollisionNode(self.hash, items)
+
+    def without(self, shift, h, key):
+        items = [item for item in self.items if item[0] != key]
+        return _CollisionNode(self.hash, items) if items else None
+
+
+_EMPTY_NODE = _BitmapNode(0, [])
+
+
+class PMap(Persistent, Mapping):
+
+    def __init__(self, items=()):
+        self._root = _EMPTY_NODE
+        self._count = 0
+        if isinstance(items, Mapping):
+            items = items.items()
+        for key, value in items:
+            self._set_in_place(key, value)
+
+    def _set_in_place(self, key, value):
+        h = _hash(key)
+        if self._root.find(0, h, key) is None:
+            self._count += 1
+        self._root = self._root.assoc(0, h, key, value)
+
+    def __getitem__(self, key):
+        entry = self._root.find(0, _hash(key), key)
+        if entry is None:
+            raise KeyError(key)
+        return entry[1]
+
+    def get(self, key, default=None):
+        entry = self._root.find(0, _hash(key), key)
+        return default if entry is None else entry[1]
+
+    def __contains__(self, key):
+        return self._root.find(0, _hash(key), key) is not None
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for key, _ in self._root.iter_entries():
+            yield key
+
+    def items(self):
+        return list(self._root.iter_entries())
+
+    def __repr__(self):
+        return 'hashmap({{{}}})'.format(', '.join('{!r}: {!r}'.format(k, v) for k, v in self._root.iter_entries()))
+
+    def set(self, key, value):
+        """Returns a new dictionary with `key` set to `value`."""
+        pmap = PMap()
+        pmap._root = self._root
+        pmap._count = self._count
+        pmap._set_in_place(key, value)
+        return pmap
+
+    def remove(self, key):
+        """Returns a new dictionary without `key`."""
+        h = _hash(key)
+        if self._root.find(0, h, key) is None:
+            raise KeyError(key)
+        pmap = PMap()
+        pmap._root = self._root.without(0, h, key) or _EMPTY_NODE
+        pmap._count = self._count - 1
+        return pmap
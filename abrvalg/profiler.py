@@ -0,0 +1,454 @@
+"""
+Profiler
+--------
+
+Deterministic profiler of Abrvalg functions and source lines. It measures call counts, inclusive and exclusive time
+of functions and hit counts and time of statements.
+
+The interpreter looks `call_function` and `eval_statement` up as module globals on every use. While a profiler is
+enabled they are replaced with timing wrappers, when no profiler is enabled evaluation runs the plain functions and
+profiling costs nothing.
+
+MemoryProfiler attributes memory traced by tracemalloc to functions and lines the same way Profiler attributes
+time, and can stop a script that goes over a memory limit.
+
+Sampler is a statistical profiler for long runs. It doesn't touch the interpreter, a timer thread periodically reads
+the Abrvalg call stack from the Python frames of the evaluating thread.
+"""
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Sized
+from abrvalg import ast, interpreter
+from abrvalg.context import current_context
+from abrvalg.errors import MemoryLimitError
+
+TOP_LEVEL = '<top level>'
+DEFAULT_SAMPLE_INTERVAL = 0.001
+DEFAULT_MAX_OVERHEAD = 0.05
+DEFAULT_LARGE_CONTAINER_SIZE = 10000
+
+
+def mark_peak():
+    """Starts measuring the peak of memory traced by tracemalloc, returns the mark `peak_since` takes."""
+    # Python before 3.9 can't reset the peak.
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()
+
+
+def peak_since(mark):
+    """
+    Returns the peak of traced memory since `mark_peak` returned `mark`. If the peak can't be reset and wasn't
+    exceeded since the mark, the memory traced now or at the mark is returned, which may be below the actual peak.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    if hasattr(tracemalloc, 'reset_peak') or peak > mark[1]:
+        return peak
+    return max(current, mark[0])
+
+
+class FunctionStats(object):
+    __slots__ = ('name', 'line', 'calls', 'inclusive', 'exclusive', 'active')
+
+    def __init__(self, name, line):
+        self.name = name
+        self.line = line
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        # Number of unfinished calls, time of recursive calls is only added to the inclusive time once.
+        self.active = 0
+
+    def to_dict(self):
+        return {'function': self.name, 'line': self.line, 'calls': self.calls,
+                'inclusive': self.inclusive, 'exclusive': self.exclusive}
+
+
+class LineStats(object):
+    __slots__ = ('function', 'line', 'hits', 'time')
+
+    def __init__(self, function, line):
+        self.function = function
+        self.line = line
+        self.hits = 0
+        self.time = 0.0
+
+    def to_dict(self):
+        return {'function': self.function, 'line': self.line, 'hits': self.hits, 'time': self.time}
+
+
+class Profiler(object):
+    """
+    Profiles evaluation on the thread that enables it, can be used as a context manager. Only one profiler can be
+    enabled at a time.
+    """
+    _lock = threading.Lock()
+    _enabled = None
+
+    def __init__(self):
+        self.functions = {}
+        self.lines = {}
+        self._thread = None
+        # Frames of unfinished calls: [function stats, start time, time spent in calls made by the function].
+        self._stack = []
+        self._call_function = interpreter.call_function
+        self._eval_statement = interpreter.eval_statement
+
+    def enable(self):
+        with Profiler._lock:
+            if Profiler._enabled is not None:
+                raise RuntimeError('Another profiler is already enabled')
+            Profiler._enabled = self
+            self._thread = threading.get_ident()
+            interpreter.call_function = self._profile_call
+            interpreter.eval_statement = self._profile_statement
+
+    def disable(self):
+        with Profiler._lock:
+            if Profiler._enabled is self:
+                interpreter.call_function = self._call_function
+                interpreter.eval_statement = self._eval_statement
+                Profiler._enabled = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disable()
+
+    def _profile_call(self, function, arguments, env):
+        if threading.get_ident() != self._thread or not isinstance(function, interpreter.Closure):
+            return self._call_function(function, arguments, env)
+        node = function.function
+        key = (node.name, node.line)
+        stats = self.functions.get(key)
+        if stats is None:
+            stats = self.functions[key] = FunctionStats(node.name, node.line)
+        stats.calls += 1
+        stats.active += 1
+        frame = [stats, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            return self._call_function(function, arguments, env)
+        finally:
+            elapsed = time.perf_counter() - frame[1]
+            self._stack.pop()
+            stats.active -= 1
+            if not stats.active:
+                stats.inclusive += elapsed
+            stats.exclusive += elapsed - frame[2]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def _profile_statement(self, node, env):
+        if threading.get_ident() != self._thread:
+            return self._eval_statement(node, env)
+        function = self._stack[-1][0].name if self._stack else TOP_LEVEL
+        key = (function, node.line)
+        stats = self.lines.get(key)
+        if stats is None:
+            stats = self.lines[key] = LineStats(function, node.line)
+        stats.hits += 1
+        start = time.perf_counter()
+        try:
+            return self._eval_statement(node, env)
+        finally:
+            stats.time += time.perf_counter() - start
+
+    def to_dict(self):
+        """Returns function stats sorted by exclusive time and line stats sorted by time, slowest first."""
+        return {
+            'functions': [stats.to_dict() for stats in
+                          sorted(self.functions.values(), key=lambda stats: stats.exclusive, reverse=True)],
+            'lines': [stats.to_dict() for stats in
+                      sorted(self.lines.values(), key=lambda stats: stats.time, reverse=True)],
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self, limit=20):
+        """Returns a text report of the `limit` slowest functions and lines."""
+        stats = self.to_dict()
+        lines = ['{:>10} {:>12} {:>12}  {}'.format('calls', 'inclusive', 'exclusive', 'function')]
+        for function in stats['functions'][:limit]:
+            lines.append('{calls:>10} {inclusive:>12.6f} {exclusive:>12.6f}  {function} (line {line})'.format(
+                **function))
+        lines.append('')
+        lines.append('{:>10} {:>12}  {}'.format('hits', 'time', 'line'))
+        for line in stats['lines'][:limit]:
+            lines.append('{hits:>10} {time:>12.6f}  {line} in {function}'.format(**line))
+        return '\n'.join(lines)
+
+
+class AllocationStats(object):
+    __slots__ = ('function', 'line', 'count', 'size', 'blocks')
+
+    def __init__(self, function, line):
+        self.function = function
+        self.line = line
+        # Calls of a function or hits of a line.
+        self.count = 0
+        # Growth of traced memory in bytes and of allocated memory blocks, roughly the number of live objects.
+        self.size = 0
+        self.blocks = 0
+
+    def to_dict(self):
+        return {'function': self.function, 'line': self.line, 'count': self.count, 'size': self.size,
+                'blocks': self.blocks}
+
+
+class MemoryProfiler(object):
+    """
+    Attributes memory that is allocated and not freed to functions and lines, tracks the peak call depth and the
+    containers of at least `large_size` items bound by assignments. Memory freed by a statement counts against it.
+    With a `limit` in bytes, evaluation raises MemoryLimitError once a statement leaves more memory traced than at
+    the first profiled statement, or once there's more while the loops and calls of a statement run. The limit and
+    the peak are measured from there, so memory of the parsed program and memory traced before, like the earlier
+    phases of statistics, doesn't count. Can be used as a context manager, profiles the thread that enables it.
+    """
+
+    def __init__(self, limit=None, large_size=DEFAULT_LARGE_CONTAINER_SIZE):
+        if limit is not None and limit <= 0:
+            raise ValueError('Memory limit must be positive')
+        self.limit = limit
+        self.large_size = large_size
+        self.functions = {}
+        self.lines = {}
+        # Largest container bound at (function, line): [function, line, type name, size].
+        self.containers = {}
+        self.peak = 0
+        self.max_depth = 0
+        self._thread = None
+        # Traced memory and its peak at the first profiled statement.
+        self._mark = None
+        self._tracing = False
+        # Frames of unfinished calls and statements: [stats, memory of nested calls or statements, their blocks].
+        self._calls = []
+        self._statements = []
+        self._call_function = None
+        self._eval_statement = None
+
+    def enable(self):
+        with Profiler._lock:
+            if Profiler._enabled is not None:
+                raise RuntimeError('Another profiler is already enabled')
+            Profiler._enabled = self
+            self._thread = threading.get_ident()
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            self._call_function = interpreter.call_function
+            self._eval_statement = interpreter.eval_statement
+            interpreter.call_function = self._profile_call
+            interpreter.eval_statement = self._profile_statement
+
+    def disable(self):
+        with Profiler._lock:
+            if Profiler._enabled is self:
+                interpreter.call_function = self._call_function
+                interpreter.eval_statement = self._eval_statement
+                if self._mark is not None:
+                    self.peak = max(self.peak, peak_since(self._mark) - self._mark[0])
+                if self._tracing:
+                    tracemalloc.stop()
+                Profiler._enabled = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disable()
+
+    def _measure(self, stack, stats, evaluate, *args):
+        stats.count += 1
+        size = tracemalloc.get_traced_memory()[0]
+        blocks = sys.getallocatedblocks()
+        frame = [stats, 0, 0]
+        stack.append(frame)
+        try:
+            return evaluate(*args)
+        finally:
+            stack.pop()
+            size = tracemalloc.get_traced_memory()[0] - size
+            blocks = sys.getallocatedblocks() - blocks
+            stats.size += size - frame[1]
+            stats.blocks += blocks - frame[2]
+            if stack:
+                stack[-1][1] += size
+                stack[-1][2] += blocks
+
+    def _profile_call(self, function, arguments, env):
+        if threading.get_ident() != self._thread or not isinstance(function, interpreter.Closure):
+            return self._call_function(function, arguments, env)
+        node = function.function
+        key = (node.name, node.line)
+        stats = self.functions.get(key)
+        if stats is None:
+            stats = self.functions[key] = AllocationStats(node.name, node.line)
+        self.max_depth = max(self.max_depth, len(self._calls) + 1)
+        return self._measure(self._calls, stats, self._call_function, function, arguments, env)
+
+    def _profile_statement(self, node, env):
+        if threading.get_ident() != self._thread:
+            return self._eval_statement(node, env)
+        if self._mark is None:
+            self._mark = mark_peak()
+        if self.limit is not None:
+            context = current_context()
+            if context.limit_check is None:
+                context.set_limit_check(self._check_running)
+        function = self._calls[-1][0].function if self._calls else TOP_LEVEL
+        key = (function, node.line)
+        stats = self.lines.get(key)
+        if stats is None:
+            stats = self.lines[key] = AllocationStats(function, node.line)
+        value = self._measure(self._statements, stats, self._eval_statement, node, env)
+        # Assignments evaluate to nothing, the assigned value is looked up.
+        if isinstance(node, (ast.Assignment, ast.AugmentedAssignment)) and isinstance(node.left, ast.Identifier):
+            self._check_container(key, env.get(node.left.value))
+        else:
+            self._check_container(key, value)
+        # Statistics reset the peak between phases, it's read after every statement so no peak is lost.
+        memory = self._mark[0]
+        self.peak = max(self.peak, peak_since(self._mark) - memory)
+        if self.limit is not None:
+            self._check_limit(function, node.line)
+        return value
+
+    def _check_limit(self, function, line):
+        size = tracemalloc.get_traced_memory()[0] - self._mark[0]
+        if size > self.limit:
+            raise MemoryLimitError('Memory limit of {} bytes exceeded at line {} in {}, {} bytes used'.format(
+                self.limit, line, function, size))
+
+    def _check_running(self):
+        # Called by the context from loop iterations and calls, stops statements that run long before they finish.
+        if Profiler._enabled is self and threading.get_ident() == self._thread and self._statements:
+            stats = self._statements[-1][0]
+            self._check_limit(stats.function, stats.line)
+
+    def _check_container(self, key, value):
+        if isinstance(value, Sized):
+            size = len(value)
+            if size >= self.large_size:
+                container = self.containers.get(key)
+                if container is None or size > container[3]:
+                    self.containers[key] = [key[0], key[1], type(value).__name__, size]
+
+    def to_dict(self):
+        """Returns function and line stats and large containers, largest first."""
+        return {
+            'peak': self.peak,
+            'max_depth': self.max_depth,
+            'functions': [stats.to_dict() for stats in
+                          sorted(self.functions.values(), key=lambda stats: stats.size, reverse=True)],
+            'lines': [stats.to_dict() for stats in
+                      sorted(self.lines.values(), key=lambda stats: stats.size, reverse=True)],
+            'containers': [dict(zip(('function', 'line', 'type', 'size'), container)) for container in
+                           sorted(self.containers.values(), key=lambda container: container[3], reverse=True)],
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self, limit=20):
+        """Returns a text report of the `limit` functions, lines and containers that take the most memory."""
+        stats = self.to_dict()
+        lines = ['peak memory: {} bytes, max call depth: {}'.format(stats['peak'], stats['max_depth']), '']
+        lines.append('{:>10} {:>14} {:>10}  {}'.format('calls', 'net bytes', 'net blocks', 'function'))
+        for function in stats['functions'][:limit]:
+            lines.append('{count:>10} {size:>14} {blocks:>10}  {function} (line {line})'.format(**function))
+        lines.append('')
+        lines.append('{:>10} {:>14} {:>10}  {}'.format('hits', 'net bytes', 'net blocks', 'line'))
+        for line in stats['lines'][:limit]:
+            lines.append('{count:>10} {size:>14} {blocks:>10}  {line} in {function}'.format(**line))
+        if stats['containers']:
+            lines.append('')
+            lines.append('{:>10} {:<12}  {}'.format('items', 'type', 'line'))
+            for container in stats['containers'][:limit]:
+                lines.append('{size:>10} {type:<12}  {line} in {function}'.format(**container))
+        return '\n'.join(lines)
+
+
+class Sampler(object):
+    """
+    Samples the Abrvalg call stack of the thread that starts it every `interval` seconds, can be used as a context
+    manager. Sampling is slowed down when needed, so it takes at most `max_overhead` of the time. Stack counts are
+    kept in the collapsed stack format of flame graph tools.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, max_overhead=DEFAULT_MAX_OVERHEAD):
+        if interval <= 0 or not 0 < max_overhead <= 1:
+            raise ValueError('Interval must be positive and maximum overhead must be between 0 and 1')
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.stacks = Counter()
+        self.samples = 0
+        self.sampling_time = 0.0
+        self._target = None
+        self._thread = None
+        self._stopped = threading.Event()
+        # Closures are arguments of interpreter calls, the profiler wrapper calls the same function.
+        self._call_code = interpreter.call_function.__code__
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError('Sampler is already started')
+        self._target = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='abrvalg-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _run(self):
+        delay = self.interval
+        while not self._stopped.wait(delay):
+            start = time.perf_counter()
+            self.sample()
+            elapsed = time.perf_counter() - start
+            self.sampling_time += elapsed
+            # The timer thread holds the GIL while sampling, waiting long enough keeps it under the overhead cap.
+            delay = max(self.interval, elapsed / self.max_overhead - elapsed)
+
+    def sample(self):
+        frame = sys._current_frames().get(self._target)
+        names = []
+        while frame is not None:
+            if frame.f_code is self._call_code:
+                function = frame.f_locals.get('function')
+                if isinstance(function, interpreter.Closure):
+                    names.append(function.function.name)
+            frame = frame.f_back
+        names.append(TOP_LEVEL)
+        names.reverse()
+        self.stacks[';'.join(names)] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        """Returns stack counts as lines of semicolon separated function names, outermost first, and a count."""
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in sorted(self.stacks.items()))
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
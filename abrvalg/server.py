@@ -0,0 +1,222 @@
+"""
+Server
+------
+
+Long-lived server that runs scripts in a pool of warm worker processes. Requests and responses are JSON objects, one
+per line, read from standard input or from a Unix socket.
+
+A request has either the `source` of a script or a `path` to it, optional global `bindings`, an optional budget of
+`max_steps` (loop iterations and calls) and `timeout` seconds and an optional `id` that is copied to the response.
+A response has the `result` of the last statement or an `error`, the captured `stdout`, whether the compiled program
+was `cached` and the compile and run `timings` in seconds.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from abrvalg.context import Budget, Output
+from abrvalg.interpreter import Interpreter
+from abrvalg.snapshot import Snapshot
+
+DEFAULT_CACHE_SIZE = 256
+
+
+class ProgramCache(object):
+    """LRU cache of compiled programs keyed by the SHA-256 hash of their source."""
+
+    def __init__(self, interpreter, size=DEFAULT_CACHE_SIZE):
+        self.interpreter = interpreter
+        self.size = size
+        self._programs = OrderedDict()
+
+    def get(self, source):
+        """Returns the compiled program of `source` and whether it was already cached."""
+        key = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        program = self._programs.get(key)
+        if program is not None:
+            self._programs.move_to_end(key)
+            return program, True
+        program = self.interpreter.compile(source)
+        self._programs[key] = program
+        if len(self._programs) > self.size:
+            self._programs.popitem(last=False)
+        return program, False
+
+
+def execute(cache, request, snapshot=None):
+    """
+    Runs a request with programs from `cache` and returns the response. Scripts start with the global values of
+    `snapshot`, restored anew for every request.
+    """
+    response = {'id': request.get('id')}
+    output = Output(io.StringIO())
+    try:
+        start = time.perf_counter()
+        source = request.get('source')
+        if source is None:
+            with open(request['path']) as f:
+                source = f.read()
+        program, cached = cache.get(source)
+        compiled = time.perf_counter()
+        env = program.create_env()
+        if snapshot is not None:
+            snapshot.restore_into(env)
+        for name, value in (request.get('bindings') or {}).items():
+            env.set(name, value)
+        budget = None
+        if request.get('max_steps') is not None or request.get('timeout') is not None:
+            budget = Budget(request.get('max_steps'), request.get('timeout'))
+        result = program.run(output=output, env=env, budget=budget)
+        finished = time.perf_counter()
+        # Values JSON doesn't support are sent as their representation. Keys it doesn't support and values that
+        # contain themselves are reported as errors.
+        result = json.loads(json.dumps(result, default=repr))
+    except Exception as err:
+        response['error'] = '{}: {}'.format(type(err).__name__, err)
+    else:
+        response['result'] = result
+        response['cached'] = cached
+        response['timings'] = {'compile': compiled - start, 'run': finished - compiled}
+    response['stdout'] = output.stream.getvalue()
+    return response
+
+
+# Program cache and snapshot of a worker process.
+_cache = None
+_snapshot = None
+
+
+def _init_worker(cache_size, persistent, snapshot_path):
+    global _cache, _snapshot
+    # Programs are cached by ProgramCache, not by the interpreter.
+    _cache = ProgramCache(Interpreter(persistent=persistent, cache_size=0), cache_size)
+    if snapshot_path is not None:
+        _snapshot = Snapshot.load(snapshot_path)
+
+
+def _execute(request):
+    return execute(_cache, request, _snapshot)
+
+
+def _warm_up(_):
+    time.sleep(0.05)
+
+
+class Server(object):
+
+    def __init__(self, workers=None, cache_size=DEFAULT_CACHE_SIZE, persistent=False, snapshot_path=None):
+        workers = workers or os.cpu_count() or 1
+        self.socket_server = None
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                        initargs=(cache_size, persistent, snapshot_path))
+        # Workers are started now, so the first requests don't wait for them.
+        list(self.pool.map(_warm_up, range(workers)))
+
+    def submit(self, line):
+        """Starts running a request line, returns a future of the response."""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be an object')
+        except ValueError as err:
+            future = Future()
+            future.set_result({'id': None, 'error': 'Invalid request: {}'.format(err)})
+            return future
+        return self.pool.submit(_execute, request)
+
+    def serve_stream(self, input_stream, output_stream):
+        """Answers request lines of `input_stream` as they finish, not necessarily in order."""
+        lock = threading.Lock()
+        pending = []
+
+        def respond(future):
+            with lock:
+                output_stream.write(json.dumps(future.result()) + '\n')
+                output_stream.flush()
+
+        for line in input_stream:
+            if line.strip():
+                future = self.submit(line)
+                future.add_done_callback(respond)
+                pending.append(future)
+        for future in pending:
+            future.exception()
+
+    def serve_socket(self, path):
+        """Answers requests of each connection to the Unix socket at `path` in order, until interrupted."""
+        server = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    response = server.submit(line.decode('utf-8')).result()
+                    self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+        # Only a socket left over by an earlier server is replaced, any other file at `path` is kept.
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError('"{}" exists and is not a socket'.format(path))
+            os.unlink(path)
+        self.socket_server = socketserver.ThreadingUnixStreamServer(path, RequestHandler)
+        try:
+            self.socket_server.serve_forever()
+        finally:
+            self.socket_server.server_close()
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def shutdown(self):
+        if self.socket_server is not None:
+            self.socket_server.shutdown()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def send_request(path, request):
+    """Sends `request` to the server listening on the Unix socket at `path` and returns the response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('r', encoding='utf-8') as f:
+            return json.loads(f.readline())
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='abrvalg serve')
+    argparser.add_argument('--socket', help='listen on a Unix socket instead of standard input')
+    argparser.add_argument('--workers', type=int, help='number of worker processes')
+    argparser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                           help='number of compiled programs each worker keeps')
+    argparser.add_argument('-p', '--persistent', action='store_true',
+                           help='make array and dictionary literals persistent (immutable) collections')
+    argparser.add_argument('--snapshot', metavar='FILE', help='start every script with the global values of a snapshot')
+    args = argparser.parse_args(argv)
+    server = Server(args.workers, args.cache_size, args.persistent, args.snapshot)
+    try:
+        if args.socket:
+            try:
+                server.serve_socket(args.socket)
+            except FileExistsError as err:
+                sys.exit(str(err))
+        else:
+            server.serve_stream(sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,79 @@
+"""
+Snapshot
+--------
+
+Global environment snapshots. A snapshot taken after running a prelude of shared definitions restores its global
+values without lexing, parsing or evaluating the prelude again.
+"""
+import io
+import pickle
+from abrvalg.stdlib import BuiltinFunction, default_builtins
+
+
+class _Pickler(pickle.Pickler):
+    # Built-ins are Python functions, they are saved by name and looked up again when the snapshot is restored.
+    # Functions defined in the saved environment refer to it, after restoring they refer to the new environment.
+
+    def __init__(self, file, builtins, env):
+        super(_Pickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.builtin_names = {id(builtin): name for name, builtin in builtins.items()}
+        self.env = env
+
+    def persistent_id(self, obj):
+        if obj is self.env:
+            return ('globals',)
+        elif isinstance(obj, BuiltinFunction):
+            name = self.builtin_names.get(id(obj))
+            if name is None:
+                raise pickle.PicklingError('Built-in function {!r} is not a default built-in'.format(obj))
+            return ('builtin', name)
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, builtins, env):
+        super(_Unpickler, self).__init__(file)
+        self.builtins = builtins
+        self.env = env
+
+    def persistent_load(self, pid):
+        if pid[0] == 'globals':
+            return self.env
+        return self.builtins[pid[1]]
+
+
+class Snapshot(object):
+    """Serialized global values of an environment, parent environments with the built-ins are not included."""
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def take(cls, env):
+        """
+        Saves the global values of `env`. Built-ins bound to their own names and built-ins other than the default
+        ones, like the file built-ins, are left out, the environment a snapshot is restored into has its own.
+        """
+        builtins = default_builtins()
+        default_ids = set(map(id, builtins.values()))
+        values = {name: value for name, value in env.asdict().items()
+                  if not isinstance(value, BuiltinFunction) or
+                  (builtins.get(name) is not value and id(value) in default_ids)}
+        f = io.BytesIO()
+        _Pickler(f, builtins, env).dump(values)
+        return cls(f.getvalue())
+
+    def restore_into(self, env):
+        """Sets new copies of the saved global values in `env`."""
+        for name, value in _Unpickler(io.BytesIO(self.data), default_builtins(), env).load().items():
+            env.set(name, value)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
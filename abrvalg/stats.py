@@ -0,0 +1,180 @@
+"""
+Stats
+-----
+
+Evaluation statistics: wall time and memory of the lexing, parsing and evaluation phases and counts of tokens, AST
+nodes, node evaluations, calls, call environments and the peak call depth.
+
+Like the profiler, counting replaces the interpreter's evaluators and `call_function` only while statistics are
+collected, evaluation without statistics doesn't pay for them. Memory is traced by tracemalloc, which slows every
+phase down, so times are only comparable to other runs with statistics.
+"""
+import json
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from abrvalg import ast, interpreter
+from abrvalg.context import Context, activate
+from abrvalg.errors import AbrvalgSyntaxError, report_syntax_error
+from abrvalg.lexer import Lexer, TokenStream
+from abrvalg.optimizer import optimize, persistent_literals
+from abrvalg.parser import Parser
+from abrvalg.profiler import Profiler, mark_peak, peak_since
+
+PHASES = ('lex', 'parse', 'eval')
+
+
+class Stats(object):
+    """
+    Statistics of an evaluation. Statistics of one evaluation are collected at a time, counting evaluations of the
+    thread that runs it. Replacing and restoring the interpreter's functions holds the profilers' lock, profilers
+    enabled while statistics are collected have to be disabled before the evaluation ends.
+    """
+    _enabled = None
+
+    def __init__(self):
+        # Phase name to its time in seconds, memory allocated and not freed and peak memory above the start in bytes.
+        self.phases = {}
+        self.tokens = 0
+        self.nodes = Counter()
+        self.evaluations = Counter()
+        self.calls = 0
+        self.environments = 0
+        self.environments_reused = 0
+        self.max_depth = 0
+        self._depth = 0
+        self._thread = None
+
+    def _count_evaluations(self, evaluators):
+        counts = self.evaluations
+        thread = self._thread
+
+        def counting(name, evaluator):
+            def evaluate(node, env):
+                if threading.get_ident() == thread:
+                    counts[name] += 1
+                return evaluator(node, env)
+            return evaluate
+
+        return {tp: counting(tp.__name__, evaluator) for tp, evaluator in evaluators.items()}
+
+    def _count_calls(self, call_function):
+        thread = self._thread
+
+        def count(function, arguments, env):
+            if threading.get_ident() != thread:
+                return call_function(function, arguments, env)
+            self.calls += 1
+            self._depth += 1
+            if self._depth > self.max_depth:
+                self.max_depth = self._depth
+            try:
+                return call_function(function, arguments, env)
+            finally:
+                self._depth -= 1
+        return count
+
+    def _evaluate(self, program, env, output, modules, budget):
+        with Profiler._lock:
+            if Stats._enabled is not None:
+                raise RuntimeError('Statistics of another evaluation are being collected')
+            Stats._enabled = self
+            self._thread = threading.get_ident()
+            evaluators = interpreter.evaluators
+            generator_evaluators = interpreter.generator_evaluators
+            call_function = interpreter.call_function
+            interpreter.evaluators = self._count_evaluations(evaluators)
+            interpreter.generator_evaluators = self._count_evaluations(generator_evaluators)
+            interpreter.call_function = self._count_calls(call_function)
+        context = Context(output, modules, budget=budget)
+        try:
+            with activate(context):
+                return interpreter.eval_statements(program.body, env)
+        finally:
+            with Profiler._lock:
+                interpreter.evaluators = evaluators
+                interpreter.generator_evaluators = generator_evaluators
+                interpreter.call_function = call_function
+                Stats._enabled = None
+            self.environments = context.frames_created
+            self.environments_reused = context.frames_reused
+
+    def to_dict(self):
+        return {
+            'phases': self.phases,
+            'tokens': self.tokens,
+            'nodes': dict(self.nodes.most_common()),
+            'evaluations': dict(self.evaluations.most_common()),
+            'calls': self.calls,
+            'environments': self.environments,
+            'environments_reused': self.environments_reused,
+            'max_depth': self.max_depth,
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self):
+        lines = ['{:<8} {:>12} {:>14} {:>14}'.format('phase', 'time', 'allocated', 'peak memory')]
+        for name in PHASES:
+            if name in self.phases:
+                lines.append('{:<8} {time:>12.6f} {allocated:>14} {peak:>14}'.format(name, **self.phases[name]))
+        lines.append('')
+        lines.append('tokens: {}'.format(self.tokens))
+        lines.append('calls: {}'.format(self.calls))
+        lines.append('environments: {} created, {} reused'.format(self.environments, self.environments_reused))
+        lines.append('max call depth: {}'.format(self.max_depth))
+        for title, counts in (('AST nodes', self.nodes), ('evaluations', self.evaluations)):
+            lines.append('')
+            lines.append('{}: {}'.format(title, sum(counts.values())))
+            for name, count in counts.most_common():
+                lines.append('{:>12}  {}'.format(count, name))
+        return '\n'.join(lines)
+
+
+class _Phase(object):
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.mark = mark_peak()
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        elapsed = time.perf_counter() - self.start
+        memory = self.mark[0]
+        self.stats.phases[self.name] = {'time': elapsed, 'allocated': tracemalloc.get_traced_memory()[0] - memory,
+                                        'peak': peak_since(self.mark) - memory}
+
+
+def evaluate_env(s, env, persistent=False, output=None, modules=None, budget=None):
+    """
+    Evaluates `s` in `env` like `interpreter.evaluate_env` and returns the value of the last statement and the
+    statistics of the evaluation. Syntax errors are reported and the value is None.
+    """
+    stats = Stats()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    lexer = Lexer()
+    try:
+        with _Phase(stats, 'lex'):
+            tokens = lexer.tokenize(s)
+        stats.tokens = len(tokens)
+        with _Phase(stats, 'parse'):
+            program = optimize(Parser().parse(TokenStream(tokens)))
+            if persistent:
+                program = persistent_literals(program)
+        stats.nodes.update(type(node).__name__ for node in ast.walk(program.body))
+        with _Phase(stats, 'eval'):
+            return stats._evaluate(program, env, output, modules, budget), stats
+    except AbrvalgSyntaxError as err:
+        report_syntax_error(lexer, err)
+        return None, stats
+    finally:
+        if not tracing:
+            tracemalloc.stop()
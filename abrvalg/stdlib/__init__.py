@@ -0,0 +1,28 @@
+"""
+Standard library
+----------------
+
+Natively implemented built-in functions, grouped into modules that are registered in the global environment. The
+default modules don't touch the file system, file built-ins are only registered for an allowlist of paths, see
+`files.create_module`.
+"""
+from abrvalg.stdlib.base import BuiltinFunction, Module
+from abrvalg.stdlib import aio, containers, core, functional, numeric, parallel, strings
+
+modules = [
+    core.module,
+    containers.module,
+    functional.module,
+    strings.module,
+    numeric.module,
+    parallel.module,
+    aio.module,
+]
+
+
+def default_builtins():
+    """Returns the built-in functions of the default modules by name."""
+    builtins = {}
+    for module in modules:
+        builtins.update(module.functions)
+    return builtins
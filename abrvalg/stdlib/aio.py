@@ -0,0 +1,126 @@
+"""
+Asynchronous built-in functions.
+
+Async functions run on an asyncio event loop started by `run`. Built-ins that wait for something return awaitables,
+so while one coroutine waits for a timer or a socket the others keep running.
+"""
+import asyncio
+from abrvalg.stdlib.base import Module
+
+ENCODING = 'utf-8'
+
+module = Module('aio')
+
+
+class Connection(object):
+    """Stream connection, reads return text and writes take text."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def __repr__(self):
+        peer = self.writer.get_extra_info('peername')
+        return '<connection {}>'.format(':'.join(str(part) for part in peer[:2]) if peer else 'closed')
+
+
+class Server(object):
+
+    def __init__(self, server):
+        self.server = server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    def __repr__(self):
+        return '<server on port {}>'.format(self.port)
+
+
+@module.function('run')
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@module.function('sleep')
+def _sleep(seconds, value=None):
+    return asyncio.sleep(seconds, value)
+
+
+async def _gather(awaitables):
+    return list(await asyncio.gather(*awaitables))
+
+
+@module.function('gather')
+def _gather_builtin(awaitables):
+    return _gather(awaitables)
+
+
+async def _connect(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    return Connection(reader, writer)
+
+
+@module.function('connect')
+def _connect_builtin(host, port):
+    return _connect(host, port)
+
+
+async def _listen(host, port, handler):
+    server = await asyncio.start_server(lambda reader, writer: handler(Connection(reader, writer)), host, port)
+    return Server(server)
+
+
+@module.function('listen', callbacks=['handler'])
+def _listen_builtin(host, port, handler):
+    return _listen(host, port, handler)
+
+
+@module.function('server_port')
+def _server_port(server):
+    return server.port
+
+
+async def _read_line(connection):
+    line = await connection.reader.readline()
+    return line.decode(ENCODING)
+
+
+@module.function('read_line')
+def _read_line_builtin(connection):
+    # The line keeps its newline, so an empty string means the other side closed the connection.
+    return _read_line(connection)
+
+
+async def _read(connection, size):
+    data = await connection.reader.read(size)
+    return data.decode(ENCODING)
+
+
+@module.function('read')
+def _read_builtin(connection, size=-1):
+    return _read(connection, size)
+
+
+async def _send(connection, text):
+    connection.writer.write(str(text).encode(ENCODING))
+    await connection.writer.drain()
+
+
+@module.function('send')
+def _send_builtin(connection, text):
+    return _send(connection, text)
+
+
+async def _close(value):
+    if isinstance(value, Server):
+        value.server.close()
+        await value.server.wait_closed()
+    else:
+        value.writer.close()
+        await value.writer.wait_closed()
+
+
+@module.function('close')
+def _close_builtin(value):
+    return _close(value)
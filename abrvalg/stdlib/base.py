@@ -0,0 +1,38 @@
+"""
+Standard library base
+---------------------
+
+Built-in function values and modules that group them.
+"""
+from collections import namedtuple, OrderedDict
+from inspect import getfullargspec
+from abrvalg.ttt import iteritems
+
+# `defaults` is the number of trailing optional parameters, missing optional arguments are left out of `args`.
+# Arguments of `callbacks` parameters are passed to `body` as Python callables.
+BuiltinFunction = namedtuple('BuiltinFunction', ['params', 'body', 'defaults', 'callbacks'])
+
+
+class Module(object):
+    """Named collection of built-in functions that can be registered in an environment."""
+
+    def __init__(self, name):
+        self.name = name
+        self.functions = OrderedDict()
+
+    def add(self, name, params, body, defaults=0, callbacks=()):
+        """Adds a built-in with a `body(args, env)` taking a dictionary of arguments and the caller environment."""
+        self.functions[name] = BuiltinFunction(params, body, defaults, tuple(callbacks))
+
+    def function(self, name=None, callbacks=()):
+        """Decorator that adds a plain Python function as a built-in, its parameters become the built-in's."""
+        def decorator(func):
+            spec = getfullargspec(func)
+            self.add(name or func.__name__, spec.args, lambda args, env: func(**args),
+                     len(spec.defaults or ()), callbacks)
+            return func
+        return decorator
+
+    def register(self, env):
+        for name, builtin in iteritems(self.functions):
+            env.set(name, builtin)
@@ -0,0 +1,125 @@
+"""
+Array, dictionary and set built-in functions.
+"""
+from abrvalg.persistent import PVector, PMap
+from abrvalg.stdlib.base import Module
+from abrvalg.typedarray import TypedArray
+from abrvalg.views import SliceView
+
+module = Module('containers')
+
+
+@module.function('slice')
+def _slice(items, start, stop):
+    """
+    Returns items from `start` to `stop`. Vectors and typed arrays are sliced by their own types into copies. Other
+    sequences return a view that aliases `items` instead of a copy: later changes to `items`, including removing
+    items, show through the view until the view itself is written to, which copies it first.
+    """
+    if isinstance(items, (PVector, TypedArray)):
+        return items[start:stop]
+    return SliceView(items, start, stop)
+
+
+@module.function('append')
+def _append(array, value):
+    if isinstance(array, PVector):
+        return array.append(value)
+    array.append(value)
+    return array
+
+
+@module.function('extend')
+def _extend(array, values):
+    if isinstance(array, PVector):
+        return array.extend(values)
+    array.extend(values)
+    return array
+
+
+@module.function('vector')
+def _vector(items):
+    return PVector(items)
+
+
+@module.function('hashmap')
+def _hashmap(dictionary):
+    return PMap(dictionary)
+
+
+@module.function('keys')
+def _keys(dictionary):
+    return list(dictionary.keys())
+
+
+@module.function('values')
+def _values(dictionary):
+    return list(dictionary.values())
+
+
+@module.function('items')
+def _items(dictionary):
+    return [[key, value] for key, value in dictionary.items()]
+
+
+@module.function('contains')
+def _contains(collection, value):
+    return value in collection
+
+
+@module.function('find')
+def _find(collection, value):
+    """Returns the index of the first occurrence of `value` or -1."""
+    if isinstance(collection, str):
+        return collection.find(value)
+    for i, item in enumerate(collection):
+        if item == value:
+            return i
+    return -1
+
+
+@module.function('set')
+def _set(items=()):
+    return set(items)
+
+
+@module.function('add')
+def _add(items, value):
+    if not isinstance(items, set):
+        raise TypeError('add expects a set, got {}'.format(type(items).__name__))
+    items.add(value)
+    return items
+
+
+@module.function('remove')
+def _remove(items, value):
+    """Removes `value` from a set or an array or key `value` from a dictionary."""
+    if isinstance(items, PMap):
+        return items.remove(value)
+    if isinstance(items, dict):
+        del items[value]
+    elif isinstance(items, (set, list)):
+        items.remove(value)
+    else:
+        raise TypeError('remove expects a set, an array or a dictionary, got {}'.format(type(items).__name__))
+    return items
+
+
+@module.function('union')
+def _union(items, other):
+    return set(items).union(other)
+
+
+@module.function('intersection')
+def _intersection(items, other):
+    return set(items).intersection(other)
+
+
+@module.function('difference')
+def _difference(items, other):
+    return set(items).difference(other)
+
+
+@module.function('is_subset')
+def _is_subset(items, other):
+    return set(items).issubset(other)
@@ -0,0 +1,57 @@
+"""
+Core built-in functions.
+"""
+from abrvalg.context import current_context
+from abrvalg.stdlib.base import Module
+
+module = Module('core')
+
+
+@module.function('print')
+def _print(value):
+    current_context().output.write('{}\n'.format(value))
+
+
+@module.function('write')
+def _write(value):
+    current_context().output.write(str(value))
+
+
+@module.function('flush')
+def _flush():
+    current_context().output.flush()
+
+
+@module.function('len')
+def _len(items):
+    return len(items)
+
+
+@module.function('str')
+def _str(value):
+    return str(value)
+
+
+@module.function('int')
+def _int(value):
+    return int(value)
+
+
+@module.function('list')
+def _list(items):
+    return list(items)
+
+
+@module.function('range')
+def _range(start, stop, step=1):
+    return range(start, stop, step)
+
+
+@module.function('abs')
+def _abs(number):
+    return abs(number)
+
+
+@module.function('round')
+def _round(number, digits=None):
+    return round(number, digits)
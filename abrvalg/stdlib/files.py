@@ -0,0 +1,97 @@
+"""
+File built-in functions.
+
+They aren't part of the default built-ins, an environment only gets them from `create_module` with an allowlist of
+the paths it may access. Reads and writes go through large buffers, and `mmap_file` maps a file into memory without
+reading it.
+"""
+import io
+import mmap
+import os
+from abrvalg.stdlib.base import Module
+from abrvalg.views import SliceView
+
+BUFFER_SIZE = 1024 * 1024
+
+
+class MappedFile(SliceView):
+    """Read-only memory-mapped file, indexing returns bytes as numbers and slicing doesn't copy."""
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            # Empty files can't be mapped.
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        super(MappedFile, self).__init__(data)
+        self.path = path
+
+    def __repr__(self):
+        return '<mapped file {!r}, {} bytes>'.format(self.path, len(self))
+
+
+def _iter_lines(path):
+    with io.open(path, 'r', buffering=BUFFER_SIZE) as f:
+        for line in f:
+            yield line[:-1] if line.endswith('\n') else line
+
+
+def _write_lines(path, lines):
+    count = 0
+    chunk = []
+    chunk_size = 0
+    with io.open(path, 'w', buffering=BUFFER_SIZE) as f:
+        for line in lines:
+            line = '{}\n'.format(line)
+            chunk.append(line)
+            chunk_size += len(line)
+            count += 1
+            if chunk_size >= BUFFER_SIZE:
+                f.write(''.join(chunk))
+                chunk = []
+                chunk_size = 0
+        f.write(''.join(chunk))
+    return count
+
+
+class Allowlist(object):
+    """Files and directories a script may access, paths are compared after resolving symbolic links."""
+
+    def __init__(self, paths):
+        self.roots = [os.path.realpath(path) for path in paths]
+
+    def allows(self, path):
+        real_path = os.path.realpath(path)
+        return any(os.path.commonpath([root, real_path]) == root for root in self.roots)
+
+    def check(self, path):
+        """Returns the resolved `path`, raises PermissionError if it's not allowed."""
+        if not self.allows(path):
+            raise PermissionError('Access to "{}" is not allowed'.format(path))
+        return os.path.realpath(path)
+
+
+def create_module(allowlist):
+    """Creates the module, only files inside the files or directories of `allowlist` can be accessed."""
+    module = Module('files')
+    check = allowlist.check
+
+    @module.function('open_lines')
+    def _open_lines(path):
+        """Lazily iterates over the lines of a file, without line endings."""
+        return _iter_lines(check(path))
+
+    @module.function('read_bytes')
+    def _read_bytes(path):
+        with open(check(path), 'rb') as f:
+            return f.read()
+
+    @module.function('write_lines')
+    def _write_lines_builtin(path, lines):
+        """Writes each item of `lines` on its own line, returns the number of lines written."""
+        return _write_lines(check(path), lines)
+
+    @module.function('mmap_file')
+    def _mmap_file(path):
+        return MappedFile(check(path))
+
+    return module
@@ -0,0 +1,29 @@
+"""
+Higher-order built-in functions.
+"""
+import functools
+from abrvalg.stdlib.base import Module
+
+module = Module('functional')
+
+
+@module.function('map', callbacks=['func'])
+def _map(func, items):
+    return [func(item) for item in items]
+
+
+@module.function('filter', callbacks=['func'])
+def _filter(func, items):
+    return [item for item in items if func(item)]
+
+
+@module.function('reduce', callbacks=['func'])
+def _reduce(func, items, initial=None):
+    if initial is None:
+        return functools.reduce(func, items)
+    return functools.reduce(func, items, initial)
+
+
+@module.function('sort', callbacks=['key'])
+def _sort(items, key=None):
+    return sorted(items, key=key)
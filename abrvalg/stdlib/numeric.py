@@ -0,0 +1,37 @@
+"""
+Typed array and numeric reduction built-in functions.
+"""
+from abrvalg import typedarray
+from abrvalg.stdlib.base import Module
+
+module = Module('numeric')
+
+
+@module.function('int_array')
+def _int_array(items):
+    return typedarray.int_array(items)
+
+
+@module.function('float_array')
+def _float_array(items):
+    return typedarray.float_array(items)
+
+
+@module.function('sum')
+def _sum(items):
+    return typedarray.array_sum(items)
+
+
+@module.function('min')
+def _min(items):
+    return typedarray.array_min(items)
+
+
+@module.function('max')
+def _max(items):
+    return typedarray.array_max(items)
+
+
+@module.function('dot')
+def _dot(left, right):
+    return typedarray.dot(left, right)
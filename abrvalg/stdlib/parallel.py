@@ -0,0 +1,163 @@
+"""
+Parallel built-in functions.
+
+`pmap` runs an Abrvalg function over chunks of items in worker processes. Functions and values are sent to the
+workers by pickling, so the function can only use built-ins, other functions and immutable values of the enclosing
+scopes.
+
+Every chunk is evaluated in its own context with the budget the caller has left. Text printed by workers is collected
+and written to the caller's output in the order of the items, and their steps count against the caller's budget.
+
+The interpreter and the standard library package import this module, so functions import them when they run.
+"""
+import io
+import itertools
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from abrvalg import ast
+from abrvalg.context import Context, Output, activate, current_context
+from abrvalg.persistent import PMap, PVector
+from abrvalg.stdlib.base import BuiltinFunction, Module
+
+module = Module('parallel')
+
+IMMUTABLE_TYPES = (int, float, str, bytes, bool, type(None))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor()
+    return _executor
+
+
+def _free_names(function):
+    """Returns the names `function` and the functions nested in it read from enclosing scopes."""
+    local_names = set(function.params)
+    read_names = set()
+    for node in ast.walk(function.body, nested_functions=False):
+        if isinstance(node, ast.Identifier):
+            read_names.add(node.value)
+        elif isinstance(node, (ast.Assignment, ast.AugmentedAssignment)) and isinstance(node.left, ast.Identifier):
+            local_names.add(node.left.value)
+        elif isinstance(node, ast.ForLoop):
+            local_names.add(node.var_name)
+        elif isinstance(node, ast.Function):
+            # Parameters and locals of nested functions belong to their own scopes.
+            local_names.add(node.name)
+            read_names |= _free_names(node)
+    return read_names - local_names
+
+
+def _is_immutable(value):
+    if isinstance(value, IMMUTABLE_TYPES):
+        return True
+    elif isinstance(value, PMap):
+        return all(_is_immutable(key) and _is_immutable(item) for key, item in value.items())
+    elif isinstance(value, (PVector, tuple)):
+        return all(_is_immutable(item) for item in value)
+    return False
+
+
+class _Captured(object):
+    """A closure sent to workers: its function and the values of the names it uses from enclosing scopes."""
+
+    def __init__(self, function):
+        self.function = function
+        self.bindings = {}
+
+
+def _capture(closure, builtins, captured):
+    """
+    Returns `closure` with the values of enclosing scopes its function uses, rejects values that can't be shared with
+    workers. Closures it uses are captured the same way, `captured` maps the ids of the closures done so far to their
+    results, so recursive functions are captured once.
+    """
+    from abrvalg.interpreter import Closure
+    result = captured.get(id(closure))
+    if result is not None:
+        return result
+    function = closure.function
+    result = captured[id(closure)] = _Captured(function)
+    for name in _free_names(function):
+        value = closure.env.get(name)
+        if value is None:
+            continue
+        elif isinstance(value, BuiltinFunction):
+            if builtins.get(name) is not value:
+                raise TypeError('Function "{}" uses built-in "{}" which is not available in worker processes'.format(
+                    function.name, name))
+        elif isinstance(value, Closure):
+            result.bindings[name] = _capture(value, builtins, captured)
+        elif _is_immutable(value):
+            result.bindings[name] = value
+        else:
+            raise TypeError('Function "{}" captures mutable variable "{}", pass it as an argument instead'.format(
+                function.name, name))
+    return result
+
+
+def _restore(captured, global_env, restored):
+    """Returns a closure of `captured` whose environment holds its captured values and has `global_env` as parent."""
+    from abrvalg.interpreter import Closure, Environment
+    closure = restored.get(id(captured))
+    if closure is None:
+        env = Environment(global_env)
+        closure = restored[id(captured)] = Closure(captured.function, env)
+        for name, value in captured.bindings.items():
+            env.set(name, _restore(value, global_env, restored) if isinstance(value, _Captured) else value)
+    return closure
+
+
+def _run_chunk(captured, allowlist, budget, chunk):
+    """Returns the results of the chunk, the text it printed and the number of steps it took."""
+    from abrvalg.interpreter import call_function, create_global_env
+    # Every closure gets its own environment again, imports are restricted like in the caller.
+    env = create_global_env()
+    env.allowlist = allowlist
+    closure = _restore(captured, env, {})
+    # Workers don't inherit the context of the process that forked them.
+    stream = io.StringIO()
+    with activate(Context(Output(stream), budget=budget)) as context:
+        results = [call_function(closure, [item], env) for item in chunk]
+    return results, stream.getvalue(), context.used_steps()
+
+
+def pmap(args, env):
+    closure = args['func']
+    function = getattr(closure, 'function', None)
+    if not isinstance(function, ast.Function):
+        raise TypeError('pmap expects an Abrvalg function, got {}'.format(
+            'a built-in function' if isinstance(closure, BuiltinFunction) else type(closure).__name__))
+    elif type(function) not in (ast.Function, ast.LeafFunction):
+        raise TypeError('pmap can\'t run generator or async functions')
+    from abrvalg.stdlib import default_builtins
+    captured = _capture(closure, default_builtins(), {})
+    items = list(args['items'])
+    chunk_size = args.get('chunk_size')
+    if chunk_size is None:
+        chunk_size = max(1, len(items) // ((os.cpu_count() or 1) * 4))
+    elif chunk_size <= 0:
+        raise ValueError('pmap chunk size must be positive')
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    context = current_context()
+    chunk_results = _get_executor().map(_run_chunk, itertools.repeat(captured), itertools.repeat(env.root().allowlist),
+                                        itertools.repeat(context.remaining_budget()), chunks)
+    results = []
+    steps = 0
+    for chunk_result, text, chunk_steps in chunk_results:
+        results.extend(chunk_result)
+        if text:
+            context.output.write(text)
+        steps += chunk_steps
+    context.add_steps(steps)
+    return results
+
+
+module.add('pmap', ['func', 'items', 'chunk_size'], pmap, defaults=1)
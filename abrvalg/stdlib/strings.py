@@ -0,0 +1,22 @@
+"""
+String built-in functions.
+"""
+from abrvalg.stdlib.base import Module
+from abrvalg.text import StringBuilder
+
+module = Module('strings')
+
+
+@module.function('join')
+def _join(items, separator=''):
+    return separator.join(str(item) for item in items)
+
+
+@module.function('split')
+def _split(string, separator=None):
+    return string.split(separator)
+
+
+@module.function('builder')
+def _builder(value=''):
+    return StringBuilder(str(value))
@@ -0,0 +1,54 @@
+"""
+Text
+----
+
+String building in amortized linear time.
+"""
+
+
+class StringBuilder(object):
+    """
+    Mutable string. Appending (`+=` or the `append` built-in) stores the part without copying the text built so far,
+    the parts are joined once the string is needed.
+    """
+
+    def __init__(self, value=''):
+        self._parts = [value] if value else []
+        self._length = len(value)
+
+    def append(self, value):
+        value = str(value)
+        self._parts.append(value)
+        self._length += len(value)
+        return self
+
+    def __iadd__(self, value):
+        return self.append(value)
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+    def __len__(self):
+        return self._length
+
+    def __eq__(self, other):
+        if isinstance(other, (str, StringBuilder)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+    def __str__(self):
+        if len(self._parts) > 1:
+            self._parts = [''.join(self._parts)]
+        return self._parts[0] if self._parts else ''
+
+    def __repr__(self):
+        return 'builder({!r})'.format(str(self))
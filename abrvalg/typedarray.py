@@ -0,0 +1,246 @@
+"""
+Typed arrays
+------------
+
+Homogeneous numeric arrays with element-wise operators and reductions. Backed by NumPy when it's installed and by
+the standard `array` module otherwise, either way the per-element work happens outside of the interpreter.
+
+Both backends follow Python arithmetic: integers that don't fit in 64 bits raise OverflowError, division and modulo
+by zero raise ZeroDivisionError and integer arrays only take integers. Where NumPy would wrap around or return inf or
+nan, the operation is done with Python numbers instead.
+"""
+import array
+import operator
+from collections.abc import Sequence
+from itertools import repeat
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INT = 'q'
+FLOAT = 'd'
+INT_MIN = -2 ** 63
+INT_MAX = 2 ** 63 - 1
+# NumPy integer results up to this magnitude can't have wrapped around.
+_SAFE_MAGNITUDE = 2.0 ** 62
+
+if numpy is not None:
+    _dtypes = {INT: numpy.int64, FLOAT: numpy.float64}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float))
+
+
+def _numpy_elementwise(op, left, right):
+    """Returns `op` of NumPy arrays or numbers, or None if the result would differ from Python arithmetic."""
+    for value in (left, right):
+        if isinstance(value, int) and not INT_MIN <= value <= INT_MAX:
+            return None
+    if op in (operator.truediv, operator.mod) and numpy.any(numpy.asarray(right) == 0):
+        return None
+    with numpy.errstate(all='ignore'):
+        result = op(left, right)
+        if result.dtype == numpy.int64:
+            if op is operator.add:
+                wrapped = (left ^ result) & (right ^ result) < 0
+            elif op is operator.sub:
+                wrapped = (left ^ right) & (left ^ result) < 0
+            elif op is operator.mul:
+                wrapped = numpy.abs(numpy.multiply(left, right, dtype=numpy.float64)) >= _SAFE_MAGNITUDE
+            else:
+                wrapped = False
+            if numpy.any(wrapped):
+                return None
+    return result
+
+
+def _magnitudes(data):
+    return numpy.abs(data.astype(numpy.float64))
+
+
+class TypedArray(Sequence):
+
+    def __init__(self, typecode, items=()):
+        self.typecode = typecode
+        # Items are checked by `array` in both cases, NumPy would truncate floats and wrap big integers around.
+        self._data = array.array(typecode, items)
+        if numpy is not None:
+            self._data = numpy.array(self._data, dtype=_dtypes[typecode])
+
+    @classmethod
+    def _wrap(cls, typecode, data):
+        typed = cls.__new__(cls)
+        typed.typecode = typecode
+        typed._data = data
+        return typed
+
+    def _elementwise(self, other, op, typecode, reflected=False):
+        if isinstance(other, TypedArray):
+            if len(other) != len(self):
+                raise ValueError('Typed arrays have different lengths: {} and {}'.format(len(self), len(other)))
+            if other.typecode == FLOAT:
+                typecode = typecode or FLOAT
+            other_data = other._data
+        elif _is_number(other):
+            if isinstance(other, float):
+                typecode = typecode or FLOAT
+            other_data = other
+        else:
+            return NotImplemented
+        typecode = typecode or self.typecode
+        left, right = (other_data, self._data) if reflected else (self._data, other_data)
+        if numpy is not None:
+            result = _numpy_elementwise(op, left, right)
+            if result is not None:
+                return TypedArray._wrap(typecode, result.astype(_dtypes[typecode]))
+            left, right = [value.tolist() if isinstance(value, numpy.ndarray) else value for value in (left, right)]
+        if _is_number(left):
+            left = repeat(left)
+        elif _is_number(right):
+            right = repeat(right)
+        data = array.array(typecode, map(op, left, right))
+        return TypedArray._wrap(typecode, numpy.array(data, dtype=_dtypes[typecode]) if numpy is not None else data)
+
+    def __add__(self, other):
+        return self._elementwise(other, operator.add, None)
+
+    def __radd__(self, other):
+        return self._elementwise(other, operator.add, None, reflected=True)
+
+    def __sub__(self, other):
+        return self._elementwise(other, operator.sub, None)
+
+    def __rsub__(self, other):
+        return self._elementwise(other, operator.sub, None, reflected=True)
+
+    def __mul__(self, other):
+        return self._elementwise(other, operator.mul, None)
+
+    def __rmul__(self, other):
+        return self._elementwise(other, operator.mul, None, reflected=True)
+
+    def __truediv__(self, other):
+        return self._elementwise(other, operator.truediv, FLOAT)
+
+    def __rtruediv__(self, other):
+        return self._elementwise(other, operator.truediv, FLOAT, reflected=True)
+
+    def __mod__(self, other):
+        return self._elementwise(other, operator.mod, None)
+
+    def __rmod__(self, other):
+        return self._elementwise(other, operator.mod, None, reflected=True)
+
+    # Comparisons produce arrays of 0 and 1.
+
+    def __gt__(self, other):
+        return self._elementwise(other, operator.gt, INT)
+
+    def __ge__(self, other):
+        return self._elementwise(other, operator.ge, INT)
+
+    def __lt__(self, other):
+        return self._elementwise(other, operator.lt, INT)
+
+    def __le__(self, other):
+        return self._elementwise(other, operator.le, INT)
+
+    def __eq__(self, other):
+        return self._elementwise(other, operator.eq, INT)
+
+    def __ne__(self, other):
+        return self._elementwise(other, operator.ne, INT)
+
+    __hash__ = None
+
+    def __neg__(self):
+        return self * -1
+
+    def __bool__(self):
+        raise TypeError('Truth value of a typed array is ambiguous, use min or max')
+
+    __nonzero__ = __bool__
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            data = self._data[index]
+            return TypedArray._wrap(self.typecode, data.copy() if numpy is not None else data)
+        value = self._data[index]
+        return value.item() if numpy is not None else value
+
+    def __setitem__(self, index, value):
+        if numpy is not None and not isinstance(index, slice):
+            # Checked like `array` does.
+            value = array.array(self.typecode, [value])[0]
+        self._data[index] = value
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __repr__(self):
+        return '{}_array({})'.format('int' if self.typecode == INT else 'float', self.tolist())
+
+    def tolist(self):
+        return self._data.tolist()
+
+    def sum(self):
+        if numpy is not None:
+            if self.typecode == INT and _magnitudes(self._data).sum() >= _SAFE_MAGNITUDE:
+                return sum(self._data.tolist())
+            return self._data.sum().item()
+        return sum(self._data)
+
+    def min(self):
+        if numpy is not None:
+            return self._data.min().item()
+        return min(self._data)
+
+    def max(self):
+        if numpy is not None:
+            return self._data.max().item()
+        return max(self._data)
+
+    def dot(self, other):
+        if len(other) != len(self):
+            raise ValueError('Typed arrays have different lengths: {} and {}'.format(len(self), len(other)))
+        if numpy is not None:
+            if (self.typecode == other.typecode == INT and
+                    numpy.dot(_magnitudes(self._data), _magnitudes(other._data)) >= _SAFE_MAGNITUDE):
+                return sum(map(operator.mul, self._data.tolist(), other._data.tolist()))
+            return numpy.dot(self._data, other._data).item()
+        return sum(map(operator.mul, self._data, other._data))
+
+
+def int_array(items):
+    return TypedArray(INT, items)
+
+
+def float_array(items):
+    return TypedArray(FLOAT, items)
+
+
+def array_sum(values):
+    return values.sum() if isinstance(values, TypedArray) else sum(values)
+
+
+def array_min(values):
+    return values.min() if isinstance(values, TypedArray) else min(values)
+
+
+def array_max(values):
+    return values.max() if isinstance(values, TypedArray) else max(values)
+
+
+def dot(left, right):
+    if isinstance(left, TypedArray) and isinstance(right, TypedArray):
+        return left.dot(right)
+    left, right = list(left), list(right)
+    if len(left) != len(right):
+        raise ValueError('Arrays have different lengths: {} and {}'.format(len(left), len(right)))
+    return sum(map(operator.mul, left, right))
@@ -2,37 +2,112 @@
 Utils
 -----
 
-Utility functions.
+Utility functions. Tokens and AST nodes are written to a stream as they are visited, nodes with an explicit stack
+instead of recursion, so dumping huge programs takes linear time and little memory.
 """
+import json
 import pprint
+import sys
+from abrvalg.stdlib.base import BuiltinFunction
 
 _pp = pprint.PrettyPrinter(indent=2)
 
 
-def _print_node(node, indent, indent_symbol):
-    if isinstance(node, list):
-        for child in node:
-            for p in _print_node(child, indent, indent_symbol):
-                yield p
-    elif isinstance(node, int) or isinstance(node, float) or isinstance(node, str) or node is None:
-        yield ' {}'.format(node)
-    elif hasattr(node, '_fields'):
-        yield '\n{}{}'.format(indent_symbol * indent, type(node).__name__)
-        for field in node._fields:
-            yield '\n{}{}:'.format(indent_symbol * (indent + 1), field, ':')
-            for p in _print_node(getattr(node, field), indent + 2, indent_symbol):
-                yield p
-    else:
-        yield '\nError! Unable to print {}'.format(node)
+def _is_node(value):
+    return hasattr(value, '_fields')
+
+
+def write_ast(node, stream=None, indent=0, indent_symbol=' ' * 4):
+    """Writes an indented tree of `node` or a list of nodes to `stream`, standard output by default."""
+    stream = stream or sys.stdout
+    # Pending values with their indent levels and text, last first.
+    stack = [(node, indent)]
+    while stack:
+        value, indent = stack.pop()
+        if isinstance(value, str) and indent is None:
+            stream.write(value)
+        elif isinstance(value, (list, tuple)) and not _is_node(value):
+            stack.extend((child, indent) for child in reversed(value))
+        elif isinstance(value, (int, float, str)) or value is None:
+            stream.write(' {}'.format(value))
+        elif _is_node(value):
+            stream.write('\n{}{}'.format(indent_symbol * indent, type(value).__name__))
+            for field in reversed(value._fields):
+                stack.append((getattr(value, field), indent + 2))
+                stack.append(('\n{}{}:'.format(indent_symbol * (indent + 1), field), None))
+        else:
+            stream.write('\nError! Unable to print {}'.format(value))
+
+
+def print_ast(node, indent=0, indent_symbol=' ' * 4, stream=None):
+    stream = stream or sys.stdout
+    write_ast(node, stream, indent, indent_symbol)
+    stream.write('\n')
+
 
+def print_tokens(tokens, stream=None):
+    stream = stream or sys.stdout
+    stream.write('[')
+    for i, token in enumerate(tokens):
+        stream.write('{}{!r}'.format(',\n  ' if i else ' ', token))
+    stream.write(']\n')
 
-def print_ast(node, indent=0, indent_symbol=' ' * 4):
-    print(''.join(_print_node(node, indent, indent_symbol)))
 
+def print_env(env, stream=None):
+    """Pretty prints the globals of `env`, leaving out the built-ins."""
+    values = {name: value for name, value in env.asdict().items() if not isinstance(value, BuiltinFunction)}
+    stream = stream or sys.stdout
+    stream.write(_pp.pformat(values) + '\n')
 
-def print_tokens(tokens):
-    _pp.pprint(tokens)
 
+def dump_tokens(tokens, stream):
+    """Writes `tokens` as JSON lines, one object with the token name, value, line and column per line."""
+    for token in tokens:
+        stream.write(json.dumps(token._asdict(), separators=(',', ':')))
+        stream.write('\n')
 
-def print_env(env):
-    _pp.pprint(env.asdict())
+
+# Marks text on the stack of `_write_json` that is written as is.
+_TEXT = object()
+
+
+def _write_json(value, stream):
+    # Nodes are objects with their type, line and fields, lists and tuples are arrays.
+    encode = json.JSONEncoder(separators=(',', ':'), default=repr).encode
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, tuple) and len(value) == 2 and value[0] is _TEXT:
+            stream.write(value[1])
+        elif _is_node(value):
+            stream.write('{"type":' + encode(type(value).__name__))
+            line = getattr(value, 'line', None)
+            if line is not None:
+                stream.write(',"line":' + encode(line))
+            stack.append((_TEXT, '}'))
+            for field in reversed(value._fields):
+                stack.append(getattr(value, field))
+                stack.append((_TEXT, ',{}:'.format(encode(field))))
+        elif isinstance(value, (list, tuple)):
+            stream.write('[')
+            stack.append((_TEXT, ']'))
+            for i in reversed(range(len(value))):
+                stack.append(value[i])
+                if i:
+                    stack.append((_TEXT, ','))
+        else:
+            stream.write(encode(value))
+
+
+def dump_ast(node, stream, lines=False):
+    """
+    Writes `node` or a list of nodes as compact JSON. With `lines` on, each node of a list is written as its own JSON
+    line, so a program can be read one statement at a time.
+    """
+    if lines and isinstance(node, list):
+        for child in node:
+            _write_json(child, stream)
+            stream.write('\n')
+    else:
+        _write_json(node, stream)
+        stream.write('\n')
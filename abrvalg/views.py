@@ -0,0 +1,98 @@
+"""
+Views
+-----
+
+Lightweight windows into sequences that avoid copying.
+"""
+from collections.abc import Sequence
+
+
+class SliceView(Sequence):
+    """
+    Contiguous window into a sequence. Reading goes through to the underlying sequence, so the view sees later
+    changes to it, if the sequence shrinks the view ends with it. Writing to the view first copies its items, after
+    that the view is an independent array.
+    """
+    __slots__ = ('_base', '_start', '_stop', '_owned')
+
+    def __init__(self, base, start=None, stop=None):
+        if isinstance(base, SliceView):
+            start, stop, _ = slice(start, stop).indices(len(base))
+            offset = base._bounds()[0]
+            start += offset
+            stop += offset
+            base = base._base
+        else:
+            start, stop, _ = slice(start, stop).indices(len(base))
+        self._base = base
+        self._start = start
+        self._stop = max(start, stop)
+        self._owned = False
+
+    def _bounds(self):
+        # The base may have shrunk since the view was made.
+        stop = min(self._stop, len(self._base))
+        return min(self._start, stop), stop
+
+    def _index(self, index):
+        start, stop = self._bounds()
+        if index < 0:
+            index += stop - start
+        if not 0 <= index < stop - start:
+            raise IndexError('Slice index out of range')
+        return start + index
+
+    def _materialize(self):
+        if not self._owned:
+            self._base = list(self)
+            self._start = 0
+            self._stop = len(self._base)
+            self._owned = True
+
+    def __len__(self):
+        start, stop = self._bounds()
+        return stop - start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step in (None, 1):
+                return SliceView(self, index.start, index.stop)
+            return list(self)[index]
+        return self._base[self._index(index)]
+
+    def __setitem__(self, index, value):
+        self._materialize()
+        self._base[self._index(index)] = value
+
+    def __iter__(self):
+        return map(self._base.__getitem__, range(*self._bounds()))
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, value):
+        self._materialize()
+        self._base.append(value)
+        self._stop += 1
+
+    def extend(self, values):
+        self._materialize()
+        self._base.extend(values)
+        self._stop = len(self._base)
@@ -0,0 +1,49 @@
+"""
+Measures the cost of the budget check that runs at every loop iteration and call, with and without a budget.
+
+    python -m benchmarks.budget --size 200000
+"""
+import argparse
+import timeit
+from abrvalg.context import Budget, Context
+from abrvalg.interpreter import Interpreter
+
+SOURCE = '''func step(x):
+    x + 1
+total = 0
+for i in 0..n:
+    total = step(total)
+total'''
+
+
+def measure(interpreter, n, budget, repeat):
+    env = interpreter.create_env()
+    env.set('n', n)
+    return min(timeit.repeat(lambda: interpreter.run(SOURCE, env, budget=budget), number=1, repeat=repeat))
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--size', type=int, default=200000)
+    argparser.add_argument('--repeat', type=int, default=5)
+    args = argparser.parse_args()
+    interpreter = Interpreter()
+    # Every iteration is one loop step and one call.
+    steps = 2 * args.size
+    for name, budget in [('no budget', None), ('budget', Budget(steps * 2, 3600))]:
+        elapsed = measure(interpreter, args.size, budget, args.repeat)
+        print('{:>10}: {:.3f}s, {:.1f}ns per step'.format(name, elapsed, elapsed / steps * 1e9))
+
+    # The check alone, compared to the same loop without it.
+    context = Context(budget=Budget(10 ** 12, 3600))
+    number = 10 ** 6
+    check = '''context.countdown -= 1
+if context.countdown < 0:
+    context.check_budget()'''
+    checked = min(timeit.repeat(check, globals={'context': context}, number=number, repeat=args.repeat))
+    empty = min(timeit.repeat('pass', number=number, repeat=args.repeat))
+    print('{:>10}: {:.1f}ns per check'.format('check', (checked - empty) / number * 1e9))
+
+
+if __name__ == '__main__':
+    main()
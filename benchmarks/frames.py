@@ -0,0 +1,43 @@
+"""
+Compares call environment allocations and run time of a merge sort with and without reusing the environments of leaf
+function calls.
+
+    python -m benchmarks.frames --size 2000
+"""
+import argparse
+import os
+import random
+import time
+from abrvalg.context import Context, Output, activate
+from abrvalg.interpreter import create_global_env, eval_statements, parse
+
+MERGE_SORT = os.path.join(os.path.dirname(__file__), '..', 'tests', 'merge_sort.abr')
+
+
+def measure(program, items, frame_pool_size):
+    env = create_global_env()
+    env.set('items', items)
+    context = Context(Output(buffer_size=0), frame_pool_size=frame_pool_size)
+    start = time.perf_counter()
+    with activate(context):
+        eval_statements(program.body, env)
+    return time.perf_counter() - start, context
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--size', type=int, default=2000)
+    args = argparser.parse_args()
+    with open(MERGE_SORT) as f:
+        # Sorts the given items instead of the script's own.
+        source = f.read().replace('merge_sort([3, 0, 6, 5, 9, 4, 2, 8, 1, 7])', 'merge_sort(items)')
+    program = parse(source)
+    items = [random.random() for _ in range(args.size)]
+    for name, frame_pool_size in [('no pool', 0), ('pool', 64)]:
+        elapsed, context = measure(program, items, frame_pool_size)
+        print('{:>8}: {:.3f}s, {} environments created, {} reused'.format(
+            name, elapsed, context.frames_created, context.frames_reused))
+
+
+if __name__ == '__main__':
+    main()
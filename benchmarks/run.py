@@ -0,0 +1,166 @@
+"""
+Runs the benchmark programs and reports the time, runs per second and peak memory of each front-end stage and of the
+evaluation. Results are compared to a baseline, the runner fails if a stage got slower than the threshold allows.
+
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --threshold 0.1
+    python -m benchmarks.run --only fib --only loops --scale 0.1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from abrvalg.context import Context, Output, activate
+from abrvalg.interpreter import create_global_env, eval_statements
+from abrvalg.lexer import Lexer, TokenStream
+from abrvalg.optimizer import optimize
+from abrvalg.parser import Parser
+from abrvalg.profiler import mark_peak, peak_since
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+PROGRAMS = os.path.join(DIRECTORY, 'programs')
+DEFAULT_BASELINE = os.path.join(DIRECTORY, 'baseline.json')
+DEFAULT_THRESHOLD = 0.2
+
+# Name, program file and the size `n` the program gets.
+BENCHMARKS = [
+    ('fib', 'fib.abr', 22),
+    ('loops', 'loops.abr', 300),
+    ('merge_sort', 'merge_sort.abr', 100000),
+    ('aggregation', 'aggregation.abr', 100000),
+    ('strings', 'strings.abr', 50000),
+    ('dispatch', 'dispatch.abr', 50000),
+]
+# Size in bytes of the generated source that only goes through the lexer and the parser.
+FRONTEND_SIZE = 4 * 1024 * 1024
+
+_FRONTEND_BLOCK = '''func f{0}(a, b):
+    if a > b:
+        return a - b * {0}
+    total = 0
+    for i in a..b:
+        total += i % 3
+    total
+
+values{0} = [1, 2.5, 'text', {{'key': {0}}}]
+match f{0}(values{0}[0], {0}):
+    when 0:
+        print('zero')
+    else:
+        result{0} = !(1 + 2 * 3 <= 4) || 5 != 6
+'''
+
+
+def generate_source(size):
+    """Returns about `size` bytes of source with unique declarations."""
+    blocks = []
+    total = 0
+    while total < size:
+        block = _FRONTEND_BLOCK.format(len(blocks))
+        blocks.append(block)
+        total += len(block)
+    return '\n'.join(blocks)
+
+
+def run_stages(source, n):
+    """Runs every stage once, returns the time and the peak traced memory above the start of each."""
+    results = {}
+
+    def stage(name, function, *args):
+        mark = mark_peak()
+        start = time.perf_counter()
+        value = function(*args)
+        elapsed = time.perf_counter() - start
+        results[name] = (elapsed, peak_since(mark) - mark[0])
+        return value
+
+    def evaluate(program, env):
+        with activate(Context(Output(buffer_size=0))):
+            eval_statements(program.body, env)
+
+    tokens = stage('lex', Lexer().tokenize, source)
+    program = stage('parse', lambda: optimize(Parser().parse(TokenStream(tokens))))
+    if n is not None:
+        env = create_global_env()
+        env.set('n', n)
+        stage('eval', evaluate, program, env)
+    return results
+
+
+def run_benchmark(source, n, repeat):
+    """
+    Returns the best time, runs per second and peak memory of each stage of `repeat` runs. Memory is measured by
+    another run, tracing it slows the stages down.
+    """
+    best = {}
+    for _ in range(repeat):
+        for stage, (elapsed, _) in run_stages(source, n).items():
+            best[stage] = min(elapsed, best.get(stage, elapsed))
+    tracemalloc.start()
+    try:
+        memory = {stage: peak for stage, (_, peak) in run_stages(source, n).items()}
+    finally:
+        tracemalloc.stop()
+    return {stage: {'time': elapsed, 'ops': 1 / elapsed if elapsed else float('inf'), 'peak': memory[stage]}
+            for stage, elapsed in best.items()}
+
+
+def compare(results, baseline, threshold):
+    """Returns descriptions of the stages that are more than `threshold` slower than the baseline."""
+    regressions = []
+    for name, stages in sorted(results.items()):
+        for stage, result in sorted(stages.items()):
+            base = baseline.get(name, {}).get(stage)
+            if base is not None and result['ops'] < base['ops'] * (1 - threshold):
+                regressions.append('{} {}: {:.2f} ops/s, baseline {:.2f} ops/s'.format(
+                    name, stage, result['ops'], base['ops']))
+    return regressions
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--only', action='append', metavar='NAME', help='run only the named benchmarks')
+    argparser.add_argument('--repeat', type=int, default=3, help='number of timed runs, the best one counts')
+    argparser.add_argument('--scale', type=float, default=1.0, help='multiplies the size of every benchmark')
+    argparser.add_argument('--baseline', default=DEFAULT_BASELINE, metavar='FILE')
+    argparser.add_argument('--save-baseline', action='store_true', help='save the results as the new baseline')
+    argparser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                           help='fail when a stage is slower than the baseline by more than this fraction')
+    argparser.add_argument('--json', metavar='FILE', help='save the results as JSON')
+    args = argparser.parse_args()
+
+    benchmarks = []
+    for name, filename, n in BENCHMARKS:
+        with open(os.path.join(PROGRAMS, filename)) as f:
+            benchmarks.append((name, f.read(), max(1, int(n * args.scale))))
+    benchmarks.append(('frontend', generate_source(int(FRONTEND_SIZE * args.scale)), None))
+    if args.only:
+        benchmarks = [benchmark for benchmark in benchmarks if benchmark[0] in args.only]
+
+    results = {}
+    print('{:<12} {:<6} {:>10} {:>12} {:>14}'.format('benchmark', 'stage', 'time', 'ops/s', 'peak memory'))
+    for name, source, n in benchmarks:
+        results[name] = run_benchmark(source, n, args.repeat)
+        for stage, result in results[name].items():
+            print('{:<12} {:<6} {time:>10.4f} {ops:>12.2f} {peak:>14}'.format(name, stage, **result))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print('\nRegressions:\n' + '\n'.join(regressions))
+            sys.exit(1)
+    else:
+        print('\nNo baseline at {}, run with --save-baseline to create it.'.format(args.baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Measures the cost of global and built-in lookups at increasing recursion depths. With lexical scoping a function
+body looks names up through the environment it was defined in, so the cost shouldn't depend on the depth.
+
+    python -m benchmarks.scoping --depths 1 10 100 200
+"""
+import argparse
+import sys
+import time
+from abrvalg.interpreter import compile
+
+SOURCE = """func lookups(n):
+    i = 0
+    while i < n:
+        len(items)
+        i = i + 1
+func descend(depth, n):
+    if depth == 0:
+        lookups(n)
+    else:
+        descend(depth - 1, n)
+descend(depth, n)
+"""
+
+
+def measure(program, depth, iterations):
+    start = time.perf_counter()
+    program.run({'depth': depth, 'n': iterations, 'items': [1, 2, 3]})
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--depths', type=int, nargs='+', default=[1, 10, 100, 200])
+    argparser.add_argument('--iterations', type=int, default=100000)
+    args = argparser.parse_args()
+    # Every Abrvalg call takes several Python frames.
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), max(args.depths) * 50))
+    program = compile(SOURCE)
+    for depth in args.depths:
+        print('depth {:>5}: {:>8.0f} ns per iteration'.format(depth, measure(program, depth, args.iterations) * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Measures how many script runs per second one shared Interpreter handles from a pool of threads.
+
+    python -m benchmarks.threads --threads 1 2 4 8
+"""
+import argparse
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from abrvalg.context import Output
+from abrvalg.interpreter import Interpreter
+
+SOURCE = """func fib(n):
+    if n < 2:
+        n
+    else:
+        fib(n - 1) + fib(n - 2)
+print(fib(12))
+"""
+
+
+def run_once(interpreter):
+    output = Output(io.StringIO())
+    interpreter.run(SOURCE, output=output)
+    return output.stream.getvalue()
+
+
+def measure(interpreter, threads, runs):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(lambda _: run_once(interpreter), range(runs)))
+    elapsed = time.perf_counter() - start
+    assert all(result == '144\n' for result in results)
+    return runs / elapsed
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    argparser.add_argument('--runs', type=int, default=200)
+    args = argparser.parse_args()
+    interpreter = Interpreter()
+    run_once(interpreter)
+    for threads in args.threads:
+        print('{:>3} threads: {:>8.1f} runs/s'.format(threads, measure(interpreter, threads, args.runs)))
+
+
+if __name__ == '__main__':
+    main()
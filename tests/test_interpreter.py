@@ -1,20 +1,436 @@
 import unittest
 import os
-from abrvalg.interpreter import evaluate
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from abrvalg.context import Budget, Context, Output, activate
+from abrvalg.errors import AbrvalgSyntaxError, BudgetExceededError
+from abrvalg.interpreter import Interpreter, compile, create_global_env, eval_statements, evaluate, evaluate_env, parse
+from abrvalg.modules import ModuleCache
+from abrvalg.stdlib import BuiltinFunction
 
 TESTS_DIR = os.path.dirname(__file__)
 
 
 class InterpreterTest(unittest.TestCase):
 
-    def _evaluate(self, s):
-        return evaluate(s, verbose=True)
+    def _evaluate(self, s, **kwargs):
+        return evaluate(s, verbose=True, **kwargs)
 
-    def _evaluate_file(self, path):
+    def _evaluate_file(self, path, **kwargs):
         with open(os.path.join(TESTS_DIR, path)) as f:
-            return self._evaluate(f.read())
+            return self._evaluate(f.read(), **kwargs)
 
     def test_big(self):
         self.assertEqual(self._evaluate_file('factorial.abr'), 3628800)
         self.assertEqual(self._evaluate_file('merge_sort.abr'), [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
         self._evaluate_file('big.abr')
+
+    def test_closures(self):
+        src = '''func counter():
+    count = [0]
+    func next():
+        count[0] += 1
+        count[0]
+    next
+func make_adder(n):
+    func add(x):
+        x + n
+    add
+c = counter()
+c()
+c()
+[c(), make_adder(10)(5)]'''
+        self.assertEqual(self._evaluate(src), [3, 15])
+        # Callees don't see the caller's variables.
+        src = '''func f():
+    local = 1
+    g()
+func g():
+    local
+f()'''
+        self.assertRaises(NameError, self._evaluate, src)
+
+    def test_frame_pool(self):
+        program = parse('func f(x):\n    x + 1\nfunc g(x):\n    func h():\n        x\n    h\n[f(1), f(2), g(3)()]')
+        context = Context(Output(StringIO()))
+        with activate(context):
+            self.assertEqual(eval_statements(program.body, create_global_env()), [2, 3, 3])
+        self.assertEqual((context.frames_created, context.frames_reused), (2, 2))
+
+    def test_sets(self):
+        src = '''seen = set()
+duplicates = []
+for x in [3, 1, 3, 2, 1]:
+    if x in seen:
+        duplicates += [x]
+    add(seen, x)
+a = {1, 2, 3}
+b = {2, 3, 4}
+[duplicates, 4 not in a, "k" in {"k": 1}, union(a, b), intersection(a, b), difference(a, b), is_subset({2}, a)]'''
+        self.assertEqual(self._evaluate(src), [[3, 1], True, True, {1, 2, 3, 4}, {2, 3}, {1}, True])
+        src = '''m = hashmap({"a": 1, "b": 2})
+d = {"a": 1, "b": 2}
+[remove(m, "a"), m, remove(d, "a"), remove([1, 2, 1], 1), remove({1, 2}, 1)]'''
+        self.assertEqual(self._evaluate(src), [{'b': 2}, {'a': 1, 'b': 2}, {'b': 2}, [2, 1], {2}])
+        self.assertRaises(TypeError, self._evaluate, 'add(vector([1]), 2)')
+        self.assertRaises(TypeError, self._evaluate, 'remove(vector([1]), 1)')
+
+    def test_augmented_assignment(self):
+        self.assertEqual(self._evaluate('x = 1\nx += 2\nx'), 3)
+        self.assertEqual(self._evaluate('a = [1]\nb = a\na += [2]\na[0] -= 1\nb'), [0, 2])
+        self.assertRaises(TypeError, self._evaluate, 'a = [1]\na += "ab"')
+        self.assertRaises(TypeError, self._evaluate, 'a = [[1]]\na[0] += "ab"')
+        self.assertEqual(self._evaluate('a = [1]\nappend(a, 2)\nextend(a, [3, 4])'), [1, 2, 3, 4])
+
+    def test_persistent(self):
+        self.assertEqual(self._evaluate_file('merge_sort.abr', persistent=True), [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+        src = '''d = {'x': [1, 2]}
+e = d
+d['x'][0] = 5
+d['y'] = 3
+[d, e]'''
+        self.assertEqual(self._evaluate(src, persistent=True), [{'x': [5, 2], 'y': 3}, {'x': [1, 2]}])
+
+    def test_slice_view(self):
+        src = '''a = [1, 2, 3, 4, 5]
+s = slice(a, 1, 4)
+t = slice(s, 1, 3)
+t[0] = 9
+[a, s, t, len(t), list(slice(s, 0-1, 3))]'''
+        self.assertEqual(self._evaluate(src), [[1, 2, 3, 4, 5], [2, 3, 4], [9, 4], 2, [4]])
+        # Views share the items of their base until they are written to.
+        src = '''a = [1, 2, 3]
+s = slice(a, 0, 2)
+a[0] = 9
+before = list(s)
+s[1] = 7
+[before, s, a]'''
+        self.assertEqual(self._evaluate(src), [[9, 2], [9, 7], [9, 2, 3]])
+        src = '''a = [1, 2, 3]
+s = slice(a, 1, 3)
+remove(a, 1)
+remove(a, 2)
+[len(s), list(s), len(slice(s, 0, 2))]'''
+        self.assertEqual(self._evaluate(src), [0, [], 0])
+        src = '''v = slice(vector([1, 2, 3]), 0, 2) + vector([4])
+t = slice(int_array(0..4), 1, 3) * 2
+[v, t]'''
+        v, t = self._evaluate(src)
+        self.assertEqual((type(v).__name__, list(v)), ('PVector', [1, 2, 4]))
+        self.assertEqual((type(t).__name__, list(t)), ('TypedArray', [2, 4]))
+
+    def test_typed_array(self):
+        src = '''a = int_array(0..5)
+b = float_array([1, 2, 3, 4, 5])
+[list(a * 2 + 1), list(b / 2), list(a >= 3), sum(a), max(b), dot(a, b)]'''
+        self.assertEqual(self._evaluate(src),
+                         [[1, 3, 5, 7, 9], [0.5, 1.0, 1.5, 2.0, 2.5], [0, 0, 0, 1, 1], 10, 5.0, 40.0])
+
+    def test_stdlib(self):
+        src = '''func square(x):
+    x * x
+func add(a, b):
+    a + b
+strings = [sort(['bb', 'a'], len), join(split('a b', ' '), '-')]
+[map(square, 1...3), filter(square, [0, 1]), reduce(add, [1, 2, 3]), list(range(0, 5, 2)), find([1, 2], 2), strings]'''
+        self.assertEqual(self._evaluate(src), [[1, 4, 9], [1], 6, [0, 2, 4], 1, [['a', 'bb'], 'a-b']])
+
+    def test_output(self):
+        stream = StringIO()
+        src = '''s = builder()
+for i in 0..3:
+    s += i
+    write(i)
+print('')
+str(s)'''
+        self.assertEqual(self._evaluate(src, output=Output(stream)), '012')
+        self.assertEqual(stream.getvalue(), '012\n')
+
+    def test_generator(self):
+        src = '''func evens(items):
+    for x in items:
+        if x % 2:
+            continue
+        yield x
+func take(items, n):
+    r = []
+    for x in items:
+        if len(r) >= n:
+            break
+        r += [x]
+    r
+take(evens(0..1000000000), 3)'''
+        self.assertEqual(self._evaluate(src), [0, 2, 4])
+
+    def test_files(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'lines.txt')
+        src = '''write_lines(path, 1...3)
+total = 0
+for line in open_lines(path):
+    total += int(line)
+data = mmap_file(path)
+[total, len(read_bytes(path)), list(slice(data, 0, 2))]'''
+        env = create_global_env(allowed_paths=[tmp_dir])
+        env.set('path', path)
+        self.assertEqual(evaluate_env(src, env), [6, 6, [ord('1'), ord('\n')]])
+        env = create_global_env(allowed_paths=[os.path.join(tmp_dir, 'other')])
+        env.set('path', path)
+        self.assertRaises(PermissionError, evaluate_env, 'read_bytes(path)', env)
+        # Without an allowlist there are no file built-ins at all.
+        for run in (evaluate, Interpreter().run, lambda src: compile(src).run()):
+            self.assertRaises(NameError, run, 'read_bytes("{}")'.format(path))
+
+    def test_async(self):
+        src = '''order = []
+async func work(name, delay):
+    await sleep(delay)
+    order += [name]
+    return name
+async func main():
+    await gather([work("slow", 0.05), work("fast", 0)])
+run(main())
+order'''
+        self.assertEqual(self._evaluate(src), ['fast', 'slow'])
+
+    def test_async_streams(self):
+        src = '''async func handle(conn):
+    line = await read_line(conn)
+    await send(conn, "echo " + line)
+    await close(conn)
+async func main():
+    server = await listen("127.0.0.1", 0, handle)
+    conn = await connect("127.0.0.1", server_port(server))
+    await send(conn, "hi\\n")
+    reply = await read_line(conn)
+    await close(conn)
+    await close(server)
+    reply
+run(main())'''
+        self.assertEqual(self._evaluate(src), 'echo hi\n')
+
+    def test_pmap(self):
+        src = '''k = 3
+func triple(x):
+    x * k
+pmap(triple, 0..10, 3)'''
+        self.assertEqual(self._evaluate(src), [x * 3 for x in range(10)])
+        src = '''k = [3]
+func triple(x):
+    x * k[0]
+pmap(triple, 0..10)'''
+        self.assertRaises(TypeError, self._evaluate, src)
+        # Parameters and locals of nested functions aren't captured.
+        src = '''x = [1]
+func f(a):
+    func g(x):
+        y = [x]
+        return y[0] * 2
+    g(a)
+pmap(f, 0..3)'''
+        self.assertEqual(self._evaluate(src), [0, 2, 4])
+        src = '''m = hashmap({"a": [1]})
+func f(a):
+    a + len(m)
+pmap(f, 0..3)'''
+        self.assertRaises(TypeError, self._evaluate, src)
+        self.assertEqual(self._evaluate(src.replace('[1]', 'vector([1])')), [1, 2, 3])
+        with self.assertRaises(TypeError) as cm:
+            self._evaluate('pmap(len, [[1]])')
+        self.assertEqual(str(cm.exception), 'pmap expects an Abrvalg function, got a built-in function')
+        for chunk_size in (0, -1):
+            self.assertRaises(ValueError, self._evaluate, 'func f(x):\n    x\npmap(f, 0..10, {})'.format(chunk_size))
+        # Every captured closure keeps its own scope.
+        src = '''k = 1
+func make(k):
+    func add(x):
+        x + k
+    add
+add10 = make(10)
+func f(x):
+    add10(x) * k
+func fib(n):
+    if n < 2:
+        return n
+    fib(n - 1) + fib(n - 2)
+[map(f, [1, 2]), pmap(f, [1, 2], 1), pmap(fib, [10, 15])]'''
+        self.assertEqual(self._evaluate(src), [[11, 12], [11, 12], [55, 610]])
+
+    def test_pmap_context(self):
+        src = 'func show(x):\n    print(x)\n    x\npmap(show, 0..4, 1)'
+        output = Output(StringIO())
+        self.assertEqual(self._evaluate(src, output=output), [0, 1, 2, 3])
+        self.assertEqual(output.stream.getvalue(), '0\n1\n2\n3\n')
+        # Workers get the budget the caller has left and their steps count against it.
+        src = 'func spin(n):\n    for i in 0..n:\n        i\n    n\npmap(spin, [50, 50], 1)'
+        self.assertEqual(self._evaluate(src, budget=Budget(steps=200)), [50, 50])
+        self.assertRaises(BudgetExceededError, self._evaluate, src, budget=Budget(steps=80))
+        self.assertRaises(BudgetExceededError, self._evaluate, 'for i in 0..60:\n    i\n' + src,
+                          budget=Budget(steps=150))
+        # A budget of one evaluation doesn't outlive it in the workers.
+        self._evaluate('func g(x):\n    x\nlen(pmap(g, 0..8))', budget=Budget(seconds=0.05))
+        time.sleep(0.1)
+        self.assertEqual(self._evaluate('func g(x):\n    x\nlen(pmap(g, 0..8))'), 8)
+
+    def test_interpreter(self):
+        interpreter = Interpreter()
+        src = 'x = 1\nx + 1'
+        self.assertEqual(interpreter.run(src), 2)
+        self.assertIs(interpreter.parse(src), interpreter.parse(src))
+        env = interpreter.create_env()
+        interpreter.run('len = 1', env)
+        self.assertEqual(interpreter.run('len([1, 2])'), 2)
+        self.assertRaises(AbrvalgSyntaxError, interpreter.run, 'x = )')
+
+    def test_interpreter_threads(self):
+        interpreter = Interpreter()
+
+        def run(n):
+            output = Output(StringIO())
+            env = interpreter.create_env()
+            env.set('n', n)
+            result = interpreter.run('for i in 0..n:\n    print(i)\nn', env, output)
+            return result, output.stream.getvalue()
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(run, range(20)))
+        self.assertEqual(results, [(n, ''.join('{}\n'.format(i) for i in range(n))) for n in range(20)])
+
+    def test_compile(self):
+        program = compile('if x > 1:\n    print(x)\nx * 2')
+        self.assertEqual(program.run({'x': 3}, Output(StringIO())), 6)
+        output = Output(StringIO())
+        results = program.run_many(({'x': x} for x in range(4)), output)
+        self.assertEqual(next(results), 0)
+        self.assertEqual(list(results), [2, 4, 6])
+        self.assertEqual(output.stream.getvalue(), '2\n3\n')
+        self.assertRaises(NameError, program.run)
+
+    def test_shadowed_len(self):
+        # The array is only appended to in place while `len` is the built-in, modules and bindings can replace it.
+        src = '''func build():
+    r = []
+    for i in 0..3:
+        len(r)
+        r = r + [i]
+    r
+build()
+seen'''
+        expected = [[], [0], [0, 1]]
+        seen = []
+        keep = BuiltinFunction(['a'], lambda args, env: seen.append(args['a']), 0, ())
+        self.assertEqual(Interpreter().compile(src).run({'len': keep, 'seen': seen}), expected)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        with open(os.path.join(tmp_dir, 'keep.abr'), 'w') as f:
+            f.write('seen = []\nfunc len(a):\n    append(seen, a)')
+        self.assertEqual(Interpreter(modules=ModuleCache([tmp_dir])).run('import "keep.abr"\n' + src), expected)
+        self.assertEqual(Interpreter().run(src.replace('seen', 'build()')), [0, 1, 2])
+
+    def test_run_many_isolation(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        with open(os.path.join(tmp_dir, 'state.abr'), 'w') as f:
+            f.write('items = []\nfunc push(x):\n    append(items, x)\n    len(items)')
+        program = Interpreter(modules=ModuleCache([tmp_dir])).compile('import "state.abr"\npush(x)')
+        # Every record imports its own modules, like separate runs.
+        self.assertEqual(list(program.run_many({'x': x} for x in range(3))), [1, 1, 1])
+        program = compile('for i in 0..n:\n    i\nn')
+        results = program.run_many([{'n': 5}, {'n': 50}], budget=Budget(steps=10))
+        self.assertEqual(next(results), 5)
+        self.assertRaises(BudgetExceededError, next, results)
+
+    def test_budget(self):
+        interpreter = Interpreter()
+        src = 'func f(x):\n    x\ntotal = 0\nfor i in 0..n:\n    total += f(i)\ntotal'
+        env = interpreter.create_env()
+        env.set('n', 50)
+        # 50 iterations and 50 calls.
+        self.assertEqual(interpreter.run(src, env, budget=Budget(steps=100, check_interval=7)), 1225)
+        env.set('n', 51)
+        self.assertRaises(BudgetExceededError, interpreter.run, src, env, budget=Budget(steps=100, check_interval=7))
+        with self.assertRaises(BudgetExceededError) as cm:
+            interpreter.run('while 1:\n    1', budget=Budget(seconds=0.05))
+        self.assertEqual(str(cm.exception), 'Time budget of 0.05 seconds exceeded')
+        # The interpreter keeps working after the error.
+        self.assertEqual(interpreter.run('x = 0\nwhile x < 5000:\n    x += 1\nx'), 5000)
+
+    def test_limit_check(self):
+        program = parse('func f(x):\n    x\nfor i in 0..5000:\n    f(i)')
+        for budget in (None, Budget(steps=20000)):
+            checks = []
+            context = Context(Output(StringIO()), budget=budget)
+            context.set_limit_check(lambda: checks.append(context.used_steps()))
+            with activate(context):
+                eval_statements(program.body, create_global_env())
+            # 5000 iterations and 5000 calls, checked once the countdown of 1000 steps goes below zero.
+            self.assertEqual(context.used_steps(), 10000)
+            self.assertEqual(checks, list(range(1001, 10000, 1001)))
+
+    def test_import(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        sources = {
+            'lib.abr': 'import "helpers.abr"\nprint("loading lib")\nfunc double(x):\n    twice(x)',
+            'helpers.abr': '_factor = 2\nfunc twice(x):\n    x * _factor',
+            'broken.abr': 'x = )',
+            'cycle.abr': 'import "cycle.abr"',
+        }
+        for name, source in sources.items():
+            with open(os.path.join(tmp_dir, name), 'w') as f:
+                f.write(source)
+        modules = ModuleCache([tmp_dir])
+        src = '''if 0:
+    import "broken.abr"
+import "lib.abr"
+import "lib.abr"
+double(4)'''
+        output = Output(StringIO())
+        self.assertEqual(self._evaluate(src, output=output, modules=modules), 8)
+        self.assertEqual(output.stream.getvalue(), 'loading lib\n')
+        self.assertEqual(Interpreter(modules=modules).run('import "lib.abr"\ndouble(1)'), 2)
+        self.assertRaises(NameError, self._evaluate, 'import "helpers.abr"\n_factor', modules=modules)
+        self.assertRaises(ImportError, self._evaluate, 'import "cycle.abr"', modules=modules)
+        self.assertRaises(ImportError, self._evaluate, 'import "missing.abr"', modules=modules)
+
+    def test_import_isolation(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        allowed_dir = os.path.join(tmp_dir, 'allowed')
+        os.mkdir(allowed_dir)
+        sources = {
+            os.path.join(allowed_dir, 'state.abr'): 'items = []\nfunc push(x):\n    append(items, x)\n    len(items)',
+            os.path.join(allowed_dir, 'reader.abr'): 'func size(path):\n    len(read_bytes(path))',
+            os.path.join(allowed_dir, 'peek.abr'): 'secret',
+            os.path.join(tmp_dir, 'outside.abr'): 'x = 1',
+        }
+        for path, source in sources.items():
+            with open(path, 'w') as f:
+                f.write(source)
+        modules = ModuleCache([allowed_dir])
+        interpreter = Interpreter(allowed_paths=[allowed_dir], modules=modules)
+        # Every run gets its own module globals.
+        self.assertEqual([interpreter.run('import "state.abr"\npush(1)') for _ in range(2)], [1, 1])
+        # Modules don't see the globals of the importing script.
+        self.assertRaises(NameError, interpreter.run, 'secret = 1\nimport "peek.abr"')
+        # Imports and the file built-ins of modules are restricted to the allowlist.
+        outside = os.path.join(tmp_dir, 'outside.abr')
+        self.assertRaises(PermissionError, interpreter.run, 'import "{}"'.format(outside))
+        self.assertRaises(PermissionError, interpreter.run, 'import "../outside.abr"')
+        self.assertRaises(PermissionError, interpreter.run, 'import "reader.abr"\nsize("{}")'.format(outside))
+        self.assertEqual(interpreter.run('import "reader.abr"\nsize("{}")'.format(os.path.join(
+            allowed_dir, 'peek.abr'))), 6)
+        # Without an allowlist imports are restricted to the search path.
+        interpreter = Interpreter(modules=modules)
+        self.assertRaises(PermissionError, interpreter.run, 'import "{}"'.format(outside))
+        self.assertRaises(PermissionError, interpreter.run, 'import "../outside.abr"')
+        self.assertEqual(interpreter.run('import "state.abr"\npush(1)'), 1)
+        # The modules a run imports share one built-ins environment.
+        context = Context(Output(StringIO()), modules)
+        with activate(context):
+            eval_statements(parse('import "state.abr"\nimport "reader.abr"').body, create_global_env())
+        self.assertEqual(len(set(id(env._parent) for env in context.module_envs.values())), 1)
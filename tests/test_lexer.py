@@ -43,3 +43,16 @@ continue'''
         src2 = '''break
     # continue'''
         self._assertTokensEq(src2, 'BREAK NEWLINE')
+
+    def test_augmented_assignment(self):
+        self._assertTokensEq(
+            'x += 1 - 2',
+            'NAME AUG_ASSIGN NUMBER OPERATOR NUMBER NEWLINE'
+        )
+
+    def test_reuse(self):
+        lexer = Lexer()
+        lexer.tokenize('x = 1\ny = 2')
+        lexer.tokenize('z')
+        self.assertEqual(lexer.source_lines, ['z'])
+        self.assertIs(lexer._regex, Lexer()._regex)
@@ -0,0 +1,63 @@
+import unittest
+from abrvalg import ast
+from abrvalg.lexer import Lexer, TokenStream
+from abrvalg.optimizer import optimize
+from abrvalg.parser import Parser
+
+
+class OptimizerTest(unittest.TestCase):
+
+    def _optimize(self, s):
+        return optimize(Parser().parse(TokenStream(Lexer().tokenize(s)))).body
+
+    def _appends(self, s):
+        return [node for node in ast.walk(self._optimize(s)) if isinstance(node, ast.AugmentedAssignment)]
+
+    def test_append(self):
+        src = '''func f(n):
+    r = []
+    for i in 0..n:
+        r = r + [i]
+    r'''
+        self.assertEqual(len(self._appends(src)), 1)
+
+    def test_aliased(self):
+        # Appends to an array that's not known to be fresh.
+        self.assertEqual(self._appends('''func f(r):
+    r = r + [1]'''), [])
+        # The array is aliased by another variable.
+        self.assertEqual(self._appends('''func f():
+    r = []
+    q = r
+    r = r + [1]
+    q'''), [])
+        # A nested function can see the variable.
+        self.assertEqual(self._appends('''func f():
+    r = []
+    func g():
+        r
+    g()
+    r = r + [1]'''), [])
+
+    def test_guarded_append(self):
+        # Whether `len` is the built-in is only known when the function runs.
+        appends = self._appends('''func f():
+    r = []
+    r = r + [len(r)]
+    r''')
+        self.assertEqual([type(node) for node in appends], [ast.GuardedAppend])
+
+    def test_other_function(self):
+        # Scoping is lexical, other functions can't see the variable.
+        self.assertEqual(len(self._appends('''func f():
+    r = []
+    g()
+    r = r + [1]
+func g():
+    r''')), 1)
+
+    def test_leaf_function(self):
+        f, g = self._optimize('func f():\n    1\nfunc g():\n    func h():\n        1')
+        self.assertIsInstance(f, ast.LeafFunction)
+        self.assertNotIsInstance(g, ast.LeafFunction)
+        self.assertIsInstance(g.body[0], ast.LeafFunction)
@@ -1,7 +1,7 @@
 import unittest
 from abrvalg import ast
 from abrvalg.lexer import Lexer, TokenStream
-from abrvalg.parser import Parser
+from abrvalg.parser import Parser, ParserError
 
 
 class ParserTest(unittest.TestCase):
@@ -17,3 +17,58 @@ class ParserTest(unittest.TestCase):
             '1',
             [ast.Number(1)]
         )
+
+    def test_augmented_assignment(self):
+        self._assertNodesEq(
+            'x[0] *= 2',
+            [ast.AugmentedAssignment('*', ast.SubscriptOperator(ast.Identifier('x'), ast.Number(0)), ast.Number(2))]
+        )
+
+    def test_generator(self):
+        self._assertNodesEq(
+            'func f():\n    yield 1',
+            [ast.GeneratorFunction('f', [], [ast.Yield(ast.Number(1))])]
+        )
+        self.assertIsInstance(self._parse('func f():\n    yield 1')[0], ast.GeneratorFunction)
+        self.assertNotIsInstance(self._parse('func f():\n    func g():\n        yield 1')[0], ast.GeneratorFunction)
+
+    def test_lines(self):
+        function, call = self._parse('func f():\n    x = 1\n\n    x\nf()')
+        self.assertEqual((function.line, call.line), (1, 5))
+        self.assertEqual([statement.line for statement in function.body], [2, 4])
+        # Lines don't take part in comparisons and nodes can't be changed.
+        self.assertEqual(call, ast.Call(ast.Identifier('f'), []))
+        self.assertEqual(hash(ast.Number(1, line=2)), hash(ast.Number(1)))
+        self.assertEqual(repr(ast.Number(1, line=2)), 'Number(value=1)')
+        self.assertFalse(hasattr(call, '__dict__'))
+        self.assertRaises(AttributeError, setattr, call, 'line', 1)
+
+    def test_set(self):
+        self._assertNodesEq('{1, x}', [ast.Set([ast.Number(1), ast.Identifier('x')])])
+        self._assertNodesEq('{1: x}', [ast.Dictionary([(ast.Number(1), ast.Identifier('x'))])])
+        self._assertNodesEq('{}', [ast.Dictionary([])])
+
+    def test_membership(self):
+        self._assertNodesEq(
+            'x not in s == y in t',
+            [ast.BinaryOperator('==',
+                                ast.BinaryOperator('not in', ast.Identifier('x'), ast.Identifier('s')),
+                                ast.BinaryOperator('in', ast.Identifier('y'), ast.Identifier('t')))]
+        )
+
+    def test_import(self):
+        self._assertNodesEq('import "lib.abr"', [ast.Import('lib.abr')])
+
+    def test_async(self):
+        self._assertNodesEq(
+            'async func f():\n    x = await g()\n    return await x',
+            [ast.AsyncFunction('f', [], [
+                ast.Assignment(ast.Identifier('x'), ast.Await(ast.Call(ast.Identifier('g'), []))),
+                ast.Return(ast.Await(ast.Identifier('x'))),
+            ])]
+        )
+        self.assertIsInstance(self._parse('async func f():\n    await g()')[0], ast.AsyncFunction)
+        self.assertRaises(ParserError, self._parse, 'func f():\n    await g()')
+        self.assertRaises(ParserError, self._parse, 'async func f():\n    func h():\n        await g()')
+        self.assertRaises(ParserError, self._parse, 'async func f():\n    x = 1 + await g()')
+        self.assertRaises(ParserError, self._parse, 'async func f():\n    yield 1')
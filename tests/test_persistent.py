@@ -0,0 +1,41 @@
+import unittest
+from abrvalg.persistent import PVector, PMap
+
+
+class CollidingKey(object):
+
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return self.value % 3
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and other.value == self.value
+
+
+class PersistentTest(unittest.TestCase):
+
+    def test_vector(self):
+        for n in [0, 1, 32, 33, 1024, 1057, 40000]:
+            vector = PVector()
+            for i in range(n):
+                vector = vector.append(i)
+            self.assertEqual(list(vector), list(range(n)))
+            self.assertEqual(vector, PVector(range(n)))
+            if n:
+                updated = vector.set(n // 2, 'x')
+                self.assertEqual(updated[n // 2], 'x')
+                self.assertEqual(vector[n // 2], n // 2)
+
+    def test_map(self):
+        keys = list(range(2000)) + [CollidingKey(i) for i in range(10)]
+        pmap = PMap()
+        for key in keys:
+            pmap = pmap.set(key, key)
+        self.assertEqual(pmap, dict((key, key) for key in keys))
+        removed = pmap
+        for key in keys[::2]:
+            removed = removed.remove(key)
+        self.assertEqual(removed, dict((key, key) for key in keys[1::2]))
+        self.assertEqual(len(pmap), len(keys))
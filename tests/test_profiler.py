@@ -0,0 +1,124 @@
+import unittest
+import tracemalloc
+from abrvalg import interpreter, stats
+from abrvalg.errors import MemoryLimitError
+from abrvalg.interpreter import create_global_env, evaluate
+from abrvalg.profiler import MemoryProfiler, Profiler, Sampler, TOP_LEVEL, mark_peak, peak_since
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_profile(self):
+        src = '''func fact(n):
+    if n <= 1:
+        return 1
+    n * fact(n - 1)
+func twice(x):
+    x * 2
+total = 0
+for i in 0..3:
+    total += twice(fact(5))
+total'''
+        call_function = interpreter.call_function
+        with Profiler() as profiler:
+            self.assertEqual(evaluate(src), 720)
+        self.assertIs(interpreter.call_function, call_function)
+        functions = {(stats['function'], stats['line']): stats for stats in profiler.to_dict()['functions']}
+        self.assertEqual(functions['fact', 1]['calls'], 15)
+        self.assertEqual(functions['twice', 5]['calls'], 3)
+        fact = functions['fact', 1]
+        self.assertLessEqual(fact['exclusive'], fact['inclusive'])
+        lines = {(stats['function'], stats['line']): stats['hits'] for stats in profiler.to_dict()['lines']}
+        self.assertEqual(lines['fact', 3], 3)
+        self.assertEqual(lines['fact', 4], 12)
+        self.assertEqual(lines[TOP_LEVEL, 9], 3)
+        self.assertIn('fact (line 1)', profiler.report())
+
+    def test_single_profiler(self):
+        with Profiler():
+            self.assertRaises(RuntimeError, Profiler().enable)
+
+
+class SamplerTest(unittest.TestCase):
+
+    def test_sample(self):
+        src = '''func inner(n):
+    total = 0
+    for i in 0..n:
+        total += i
+    total
+func outer():
+    inner(100000)
+outer()'''
+        with Sampler(interval=0.0005) as sampler:
+            evaluate(src)
+        self.assertGreater(sampler.samples, 0)
+        self.assertEqual(sum(sampler.stacks.values()), sampler.samples)
+        self.assertIn(TOP_LEVEL + ';outer;inner', sampler.stacks)
+        for line in sampler.collapsed().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith(TOP_LEVEL))
+            self.assertGreater(int(count), 0)
+
+    def test_invalid_options(self):
+        self.assertRaises(ValueError, Sampler, interval=0)
+        self.assertRaises(ValueError, Sampler, max_overhead=2)
+
+
+class MemoryProfilerTest(unittest.TestCase):
+    src = '''func grow(n):
+    result = []
+    for i in 0..n:
+        result = result + [i]
+    result
+items = grow(5000)
+len(items)'''
+
+    def test_profile(self):
+        with MemoryProfiler(large_size=1000) as profiler:
+            self.assertEqual(evaluate(self.src), 5000)
+        stats = profiler.to_dict()
+        self.assertEqual(stats['max_depth'], 1)
+        self.assertEqual(stats['functions'][0]['function'], 'grow')
+        lines = {(line['function'], line['line']): line for line in stats['lines']}
+        self.assertEqual(lines['grow', 4]['count'], 5000)
+        self.assertGreater(lines['grow', 4]['size'], 0)
+        self.assertIn({'function': TOP_LEVEL, 'line': 6, 'type': 'list', 'size': 5000}, stats['containers'])
+        self.assertGreater(stats['peak'], 0)
+
+    def test_limit(self):
+        eval_statement = interpreter.eval_statement
+        with MemoryProfiler(limit=100000):
+            with self.assertRaises(MemoryLimitError) as cm:
+                evaluate(self.src)
+        self.assertIn('at line 4 in grow', str(cm.exception))
+        self.assertIs(interpreter.eval_statement, eval_statement)
+        # The interpreter keeps working after the error.
+        self.assertEqual(evaluate('1 + 1'), 2)
+        self.assertRaises(ValueError, MemoryProfiler, limit=0)
+
+    def test_baseline(self):
+        # Memory traced before the first statement doesn't count against the limit or the peak.
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        data = bytearray(1000000)
+        with MemoryProfiler(limit=100000) as profiler:
+            self.assertEqual(evaluate('x = [1, 2]\nlen(x)'), 2)
+            result, _ = stats.evaluate_env('len([1, 2])', create_global_env())
+            self.assertEqual(result, 2)
+        self.assertLess(profiler.peak, len(data))
+
+    def test_peak(self):
+        size = 1000000
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        reset_peak = getattr(tracemalloc, 'reset_peak', None)
+        # Measured with and without resetting the peak, which needs Python 3.9.
+        for reset in (True, False):
+            if not reset and reset_peak is not None:
+                del tracemalloc.reset_peak
+                self.addCleanup(setattr, tracemalloc, 'reset_peak', reset_peak)
+            mark = mark_peak()
+            data = bytearray(size)
+            del data
+            self.assertGreaterEqual(peak_since(mark) - mark[0], size)
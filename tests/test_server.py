@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from io import StringIO
+from abrvalg.interpreter import Interpreter, create_global_env, evaluate_env
+from abrvalg.server import ProgramCache, Server, execute, send_request
+from abrvalg.snapshot import Snapshot
+
+
+class ServerTest(unittest.TestCase):
+
+    def test_execute(self):
+        cache = ProgramCache(Interpreter(cache_size=0), size=1)
+        request = {'id': 1, 'source': 'print(x)\n[x, builder("a")]', 'bindings': {'x': 2}}
+        response = execute(cache, request)
+        self.assertEqual(response['id'], 1)
+        self.assertEqual(response['result'], [2, "builder('a')"])
+        self.assertEqual(response['stdout'], '2\n')
+        self.assertFalse(response['cached'])
+        self.assertTrue(execute(cache, request)['cached'])
+        execute(cache, {'source': '1'})
+        self.assertFalse(execute(cache, request)['cached'])
+        response = execute(cache, {'source': 'print(1)\nx'})
+        self.assertEqual(response['error'], 'NameError: Name "x" is not defined')
+        self.assertEqual(response['stdout'], '1\n')
+        response = execute(cache, {'source': 'while 1:\n    1', 'max_steps': 10})
+        self.assertEqual(response['error'], 'BudgetExceededError: Step budget of 10 exceeded')
+        for source in ('{vector([1]): 1}', 'a = []\nappend(a, a)\na'):
+            response = execute(cache, {'source': source})
+            self.assertNotIn('result', response)
+            self.assertRegex(response['error'], '^(TypeError|ValueError): ')
+
+    def test_execute_snapshot(self):
+        env = create_global_env()
+        evaluate_env('items = []\nfunc add(x):\n    items += [x]\n    len(items)', env)
+        snapshot = Snapshot.take(env)
+        cache = ProgramCache(Interpreter(cache_size=0))
+        request = {'source': 'add(y)', 'bindings': {'y': 1}}
+        self.assertEqual(execute(cache, request, snapshot)['result'], 1)
+        self.assertEqual(execute(cache, request, snapshot)['result'], 1)
+
+    def test_serve(self):
+        server = Server(workers=2)
+        self.addCleanup(server.close)
+        output = StringIO()
+        server.serve_stream(StringIO('{"id": 1, "source": "1 + 1"}\n[]\n'), output)
+        responses = sorted((json.loads(line) for line in output.getvalue().splitlines()), key=lambda r: r['id'] or 0)
+        self.assertEqual(responses[0]['error'], 'Invalid request: Request must be an object')
+        self.assertEqual(responses[1]['result'], 2)
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        socket_path = os.path.join(tmp_dir, 'abrvalg.sock')
+        thread = threading.Thread(target=server.serve_socket, args=(socket_path,))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        while server.socket_server is None:
+            time.sleep(0.01)
+        script_path = os.path.join(tmp_dir, 'script.abr')
+        with open(script_path, 'w') as f:
+            f.write('print("hi")\n3')
+        response = send_request(socket_path, {'path': script_path})
+        self.assertEqual((response['result'], response['stdout']), (3, 'hi\n'))
+        # Files that aren't sockets are never replaced.
+        self.assertRaises(FileExistsError, server.serve_socket, script_path)
+        with open(script_path) as f:
+            self.assertEqual(f.read(), 'print("hi")\n3')
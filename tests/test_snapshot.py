@@ -0,0 +1,36 @@
+import unittest
+import os
+from abrvalg.interpreter import create_global_env, evaluate_env
+from abrvalg.snapshot import Snapshot
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def test_restore(self):
+        env = create_global_env()
+        evaluate_env('func double(x):\n    x * 2\nsize = len\nitems = [1, 2]', env)
+        env.asdict().pop('len')
+        snapshot = Snapshot.take(env)
+        for _ in range(2):
+            restored = create_global_env()
+            snapshot.restore_into(restored)
+            self.assertEqual(evaluate_env('items[0] = 5\n[double(size(items)), items]', restored), [4, [5, 2]])
+
+    def test_globals(self):
+        # Restored functions see the globals of the environment they are restored into.
+        env = create_global_env()
+        evaluate_env('func scaled(x):\n    x * factor', env)
+        restored = create_global_env()
+        Snapshot.take(env).restore_into(restored)
+        self.assertEqual(evaluate_env('factor = 3\nscaled(2)', restored), 6)
+
+    def test_file_builtins(self):
+        # File built-ins stay out of the snapshot, user globals round-trip.
+        env = create_global_env(allowed_paths=[os.curdir])
+        evaluate_env('func double(x):\n    x * 2\nitems = [1, 2]', env)
+        snapshot = Snapshot.take(env)
+        for allowed_paths in (None, [os.curdir]):
+            restored = create_global_env(allowed_paths=allowed_paths)
+            snapshot.restore_into(restored)
+            self.assertEqual(evaluate_env('[double(2), items]', restored), [4, [1, 2]])
+            self.assertEqual(restored.get('read_bytes') is not None, allowed_paths is not None)
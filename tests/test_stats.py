@@ -0,0 +1,52 @@
+import unittest
+import threading
+from abrvalg import interpreter
+from abrvalg.interpreter import create_global_env, evaluate
+from abrvalg.stats import PHASES, evaluate_env
+from abrvalg.stdlib.base import BuiltinFunction
+
+
+class StatsTest(unittest.TestCase):
+
+    def test_stats(self):
+        src = '''func fib(n):
+    if n < 2:
+        return n
+    fib(n - 1) + fib(n - 2)
+fib(5)'''
+        evaluators = interpreter.evaluators
+        result, stats = evaluate_env(src, create_global_env())
+        self.assertEqual(result, 5)
+        self.assertIs(interpreter.evaluators, evaluators)
+        self.assertEqual(sorted(stats.phases), sorted(PHASES))
+        self.assertGreater(stats.tokens, 0)
+        self.assertEqual(stats.nodes['LeafFunction'], 1)
+        self.assertEqual(stats.calls, 15)
+        self.assertEqual(stats.evaluations['Call'], 15)
+        self.assertEqual(stats.max_depth, 5)
+        self.assertEqual(stats.environments + stats.environments_reused, 15)
+        self.assertEqual(stats.to_dict()['calls'], 15)
+        self.assertIn('max call depth: 5', stats.report())
+
+    def test_syntax_error(self):
+        result, stats = evaluate_env('x = (', create_global_env())
+        self.assertIsNone(result)
+        self.assertNotIn('eval', stats.phases)
+
+    def test_threads(self):
+        results = []
+
+        def other_thread(args, env):
+            # Evaluations of other threads aren't counted, statistics of one evaluation are collected at a time.
+            thread = threading.Thread(target=lambda: results.append(evaluate('func f(x):\n    x\nf(1) + f(2)')))
+            thread.start()
+            thread.join()
+            self.assertRaises(RuntimeError, evaluate_env, '1', create_global_env())
+            return 0
+
+        env = create_global_env()
+        env.set('other_thread', BuiltinFunction([], other_thread, 0, ()))
+        result, stats = evaluate_env('func g():\n    other_thread()\ng()', env)
+        self.assertEqual((result, results), (0, [3]))
+        self.assertEqual(stats.calls, 2)
+        self.assertEqual(evaluate_env('1', create_global_env())[0], 1)
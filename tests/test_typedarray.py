@@ -0,0 +1,67 @@
+import unittest
+from abrvalg import typedarray
+from abrvalg.typedarray import INT_MAX, INT_MIN, dot, float_array, int_array
+
+
+class TypedArrayTest(unittest.TestCase):
+    # Runs with the `array` backend, the subclass below runs the same tests with NumPy.
+    backend = None
+
+    def setUp(self):
+        numpy = typedarray.numpy
+        typedarray.numpy = self.backend
+        self.addCleanup(setattr, typedarray, 'numpy', numpy)
+
+    def test_operators(self):
+        a = int_array([-7, 0, 7])
+        self.assertEqual(list(a % 3), [2, 0, 1])
+        self.assertEqual(list(a * 2 - 1), [-15, -1, 13])
+        self.assertEqual(list(a / 2), [-3.5, 0.0, 3.5])
+        self.assertEqual(list(a > 2 ** 70), [0, 0, 0])
+        self.assertEqual(list(int_array([2 ** 31]) * 2 ** 31), [2 ** 62])
+        self.assertEqual(list(float_array([1e308]) * 10), [float('inf')])
+
+    def test_overflow(self):
+        big = int_array([INT_MAX])
+        for operation in (lambda: big + 1, lambda: big * 2, lambda: -big - 2, lambda: -int_array([INT_MIN]),
+                          lambda: big + int_array([1]), lambda: int_array([1]) + 2 ** 70):
+            self.assertRaises(OverflowError, operation)
+        self.assertEqual(int_array([INT_MAX, INT_MAX]).sum(), 2 * INT_MAX)
+        self.assertEqual(int_array([2 ** 62, 2 ** 62]).dot(int_array([2, 2])), 2 ** 64)
+
+    def test_division_by_zero(self):
+        a = int_array([1, 0])
+        for operation in (lambda: a / 0, lambda: a % 0, lambda: 1 / a, lambda: a % int_array([1, 0]),
+                          lambda: float_array([1.0]) % 0.0):
+            self.assertRaises(ZeroDivisionError, operation)
+
+    def test_items(self):
+        a = int_array([1, 2])
+        self.assertRaises(TypeError, int_array, [1.5])
+        self.assertRaises(OverflowError, int_array, [2 ** 63])
+        with self.assertRaises(TypeError):
+            a[0] = 1.5
+        with self.assertRaises(OverflowError):
+            a[0] = 2 ** 63
+        a[1] = 5
+        self.assertEqual(list(a), [1, 5])
+        b = float_array([1.5])
+        b[0] = 2
+        self.assertEqual(list(b), [2.0])
+
+    def test_dot(self):
+        self.assertEqual(dot(int_array([1, 2]), float_array([3, 4])), 11.0)
+        self.assertEqual(dot([1, 2], [3, 4]), 11)
+        self.assertRaises(ValueError, dot, [1, 2], [3])
+        self.assertRaises(ValueError, dot, int_array([1, 2]), int_array([3]))
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, 'NumPy is not installed')
+class NumpyTypedArrayTest(TypedArrayTest):
+    backend = numpy
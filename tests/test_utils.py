@@ -0,0 +1,68 @@
+import json
+import unittest
+from io import StringIO
+from abrvalg import ast
+from abrvalg.interpreter import create_global_env, parse
+from abrvalg.lexer import Lexer
+from abrvalg.utils import dump_ast, dump_tokens, print_ast, print_env, print_tokens
+
+
+class UtilsTest(unittest.TestCase):
+
+    def test_print_ast(self):
+        stream = StringIO()
+        print_ast(parse('x = [1, "a"]').body, stream=stream)
+        self.assertEqual(stream.getvalue(), '''
+Assignment
+    left:
+        Identifier
+            value: x
+    right:
+        Array
+            items:
+                Number
+                    value: 1
+                String
+                    value: a
+''')
+
+    def test_print_tokens(self):
+        stream = StringIO()
+        print_tokens(Lexer().tokenize('x = 1'), stream)
+        self.assertEqual(stream.getvalue(), "[ ('NAME', 'x', 1, 1),\n  ('ASSIGN', '=', 1, 3),\n"
+                                            "  ('NUMBER', 1, 1, 5),\n  ('NEWLINE', None, 1, 6)]\n")
+
+    def test_print_env(self):
+        env = create_global_env()
+        env.set('x', [1])
+        stream = StringIO()
+        print_env(env, stream)
+        self.assertEqual(stream.getvalue(), "{'x': [1]}\n")
+
+    def test_deep_ast(self):
+        # Deeper than the recursion limit.
+        node = ast.Number(1)
+        for _ in range(5000):
+            node = ast.UnaryOperator('-', node)
+        print_ast(node, stream=StringIO())
+        stream = StringIO()
+        dump_ast(node, stream)
+        # Too deep for json.loads as well.
+        self.assertTrue(stream.getvalue().startswith('{"type":"UnaryOperator","operator":"-","right":{'))
+        self.assertTrue(stream.getvalue().endswith('{"type":"Number","value":1}' + '}' * 5000 + '\n'))
+
+    def test_dump(self):
+        body = parse('func f(a):\n    {a: [1, 2.5]}\nf("k")').body
+        stream = StringIO()
+        dump_ast(body, stream, lines=True)
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(lines[0]['type'], 'LeafFunction')
+        self.assertEqual(lines[0]['line'], 1)
+        self.assertEqual(lines[0]['body'][0]['items'], [[{'type': 'Identifier', 'value': 'a'}, {
+            'type': 'Array', 'items': [{'type': 'Number', 'value': 1}, {'type': 'Number', 'value': 2.5}]}]])
+        self.assertEqual(lines[1], {'type': 'Call', 'line': 3, 'left': {'type': 'Identifier', 'value': 'f'},
+                                    'arguments': [{'type': 'String', 'value': 'k'}]})
+        stream = StringIO()
+        dump_tokens(Lexer().tokenize('x = 1'), stream)
+        self.assertEqual(json.loads(stream.getvalue().splitlines()[2]),
+                         {'name': 'NUMBER', 'value': 1, 'line': 1, 'column': 5})